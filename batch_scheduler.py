@@ -0,0 +1,312 @@
+"""
+Batch scheduler for multi-scene, multi-city runs.
+
+Takes a JSON catalog of scenes and runs the per-scene pipeline
+(features → patches → inference → metrics → mosaic) over a process pool.
+Every finished stage is recorded in a checkpoint file, together with a
+hash of the catalog values and source files it read (scene bands,
+population rasters, roads, registered model weights, ground truth), so an
+interrupted run picks up where it stopped and a changed input re-runs
+from the first stage it affects.
+
+Catalog format:
+    {"scenes": [
+        {"city": "Pune", "scene_id": "LC09_L2SP_147047_20250902_20250904_02_T2",
+         "images_dir": "data/images",            # optional
+         "ground_truth": "data/masks/pune.tif",  # optional, enables metrics
+         "min_valid_fraction": 0.5,              # optional, QA tile filter
+         "model": "unet_lite",                   # optional, registered model name
+         "road_network": true}                   # optional, adds road centrality bands;
+                                                 # the model must take the 10-band stack
+    ]}
+
+Usage:
+    python batch_scheduler.py catalog.json --workers 4
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import traceback
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from config import (
+    BASE_DIR, IMAGES_DIR, MAPS_DIR, CHECKPOINTS_DIR, PATCH_SIZE, MIN_VALID_FRACTION, POP_YEARS,
+)
+import pipeline
+import qa_mask
+from feature_store import write_feature_store, normalized_encoding, FeatureStore, BAND_NAMES
+from model_registry import load_registry, model_path, DEFAULT_MODEL
+from patch_manifest import PatchManifest, stitch_predictions, write_mosaic
+from patch_store import PatchStore, write_patch_store, percentile_labels
+from road_network import NETWORK_BAND_NAMES
+from prediction_store import (
+    build_store, save_store, store_metrics,
+    quantize_probabilities, dequantize_probabilities,
+)
+
+STAGES = ["features", "patches", "inference", "metrics", "mosaic"]
+
+# Scene bands the features stage reads (reference grid, NDVI, QA masks)
+FEATURE_SCENE_BANDS = ["SR_B3", "SR_B4", "SR_B5", "QA_PIXEL", "SR_QA_AEROSOL"]
+
+# Catalog keys each stage reads; a change re-runs that stage and everything after it
+STAGE_INPUTS = {
+    "features": ["images_dir", "road_network"],
+    "patches": ["min_valid_fraction"],
+    "inference": ["model"],
+    "metrics": ["ground_truth"],
+    "mosaic": [],
+}
+
+
+# ---------------------------
+# Catalog / Checkpoints
+# ---------------------------
+def load_catalog(path):
+    """Read scene entries from a catalog file"""
+    with open(path) as f:
+        catalog = json.load(f)
+    entries = catalog["scenes"] if isinstance(catalog, dict) else catalog
+    for entry in entries:
+        if "city" not in entry or "scene_id" not in entry:
+            raise ValueError(f"Catalog entry needs 'city' and 'scene_id': {entry}")
+    return entries
+
+
+def task_id(entry):
+    return f"{entry['city']}_{entry['scene_id']}"
+
+
+def checkpoint_path(entry):
+    return CHECKPOINTS_DIR / f"{task_id(entry)}.json"
+
+
+def load_checkpoint(entry):
+    """Completed stages for a task ({stage: {"output": ..., "seconds": ...}})"""
+    path = checkpoint_path(entry)
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_checkpoint(entry, checkpoint):
+    path = checkpoint_path(entry)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp, path)
+
+
+def file_stamp(path):
+    """[size, mtime] of an input file, None when it does not exist"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def stage_sources(entry, stage):
+    """Input files / registry entries a stage reads besides catalog values"""
+    if stage == "features":
+        images_dir = resolve(entry.get("images_dir", IMAGES_DIR))
+        files = [pipeline.band_path(entry["scene_id"], band, images_dir) for band in FEATURE_SCENE_BANDS]
+        files += [pipeline.population_path(year) for year in POP_YEARS]
+        files.append(pipeline.roads_path(entry["city"]))
+        return {str(f): file_stamp(f) for f in files}
+    if stage == "inference":
+        # Re-registered or retrained weights behind the same name count as a change
+        name = entry.get("model", DEFAULT_MODEL)
+        info = load_registry().get(name)
+        return {"registry": info, "weights": file_stamp(model_path(name)) if info else None}
+    if stage == "metrics" and entry.get("ground_truth"):
+        return {"ground_truth": file_stamp(resolve(entry["ground_truth"]))}
+    return {}
+
+
+def stage_inputs_hash(entry, stage):
+    """Hash of the catalog values and source files a stage depends on"""
+    inputs = {key: entry.get(key) for key in STAGE_INPUTS[stage]}
+    inputs["sources"] = stage_sources(entry, stage)
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def resolve(path):
+    """Catalog paths are relative to the project root"""
+    path = Path(path)
+    return path if path.is_absolute() else BASE_DIR / path
+
+
+# ---------------------------
+# Stages
+# ---------------------------
+def stage_features(entry, dirs):
+    images_dir = resolve(entry.get("images_dir", IMAGES_DIR))
+    usable = qa_mask.usable_mask(entry["scene_id"], images_dir)
+    road_network = entry.get("road_network", False)
+    features = pipeline.build_features(entry["city"], entry["scene_id"], images_dir, usable, road_network)
+    band_names = BAND_NAMES + NETWORK_BAND_NAMES if road_network else BAND_NAMES
+    out = dirs["processed"] / "features_store"
+    write_feature_store(features, out, band_names, masks={"usable": usable})
+    return out
+
+
+def stage_patches(entry, dirs):
+    store = FeatureStore(dirs["processed"] / "features_store")
+    # Only tiles with enough clear pixels are patched (and later scored)
+    valid_fraction = qa_mask.tile_valid_fraction(store.mask("usable"), PATCH_SIZE)
+    tile_index = qa_mask.valid_tile_index(
+        valid_fraction, entry.get("min_valid_fraction", MIN_VALID_FRACTION))
+    # Patches keep the uint16 codes; per-band min-max normalization is
+    # folded into the recorded scale/offset
+    codes = store.tile_codes(tile_index)
+    scale, offset = normalized_encoding(codes)
+    # Where each kept patch sits in the scene (row i <-> patch i)
+    meta = pipeline.reference_meta(entry["scene_id"], resolve(entry.get("images_dir", IMAGES_DIR)))
+    manifest = PatchManifest.from_tiles(entry["city"], entry["scene_id"], meta, tile_index, PATCH_SIZE)
+    out = dirs["patches"] / "patch_store"
+    write_patch_store(out, codes, scale, offset, manifest, labels=percentile_labels(codes),
+                      valid_fraction=valid_fraction[tile_index], bands=store.bands)
+    print(f"{task_id(entry)}: kept {len(tile_index)}/{len(valid_fraction)} tiles after QA masking")
+    return out
+
+
+def check_model_bands(entry, patches):
+    """Refuse patch stores whose bands the selected model cannot take"""
+    name = entry.get("model", DEFAULT_MODEL)
+    model_bands = pipeline.load_unet(model_path(name)).input_shape[-1]
+    n_bands = patches.patch_shape[-1]
+    if model_bands != n_bands:
+        raise ValueError(f"{task_id(entry)}: model '{name}' takes {model_bands} input bands, "
+                         f"but the scene's patches have {n_bands}"
+                         + (" (road_network adds 3)" if entry.get("road_network") else ""))
+
+
+def stage_inference(entry, dirs):
+    patches = PatchStore(dirs["patches"] / "patch_store")
+    check_model_bands(entry, patches)
+    preds = pipeline.run_inference_quantized(patches.codes, patches.scale, patches.offset,
+                                             model_path(entry.get("model", DEFAULT_MODEL)))
+    out = dirs["predictions"] / "predictions.npz"
+    pipeline.save_npz_atomic(out, pred_q=quantize_probabilities(preds),
+                             tile_index=patches.manifest.tile_index())
+    return out
+
+
+def stage_metrics(entry, dirs):
+    with np.load(dirs["predictions"] / "predictions.npz") as data:
+        preds = dequantize_probabilities(data["pred_q"])
+        tile_index = data["tile_index"]
+
+    summary = {"city": entry["city"], "scene_id": entry["scene_id"],
+               "n_patches": int(preds.shape[0]),
+               "urban_fraction": float((preds > 0.5).mean()) if preds.size else 0.0}
+
+    if entry.get("ground_truth") and preds.size:
+        meta = pipeline.reference_meta(entry["scene_id"], resolve(entry.get("images_dir", IMAGES_DIR)))
+        gt = pipeline.resample_to_grid(resolve(entry["ground_truth"]), meta)
+        gt_patches = pipeline.create_patches(gt[..., None], PATCH_SIZE, tile_index)
+        store = build_store(preds, gt_patches)
+        save_store(dirs["predictions"] / "predictions_packed.npz", store)
+        summary.update(store_metrics(store))
+
+    out = dirs["predictions"] / "metrics.json"
+    with open(out, "w") as f:
+        json.dump(summary, f, indent=2)
+    return out
+
+
+def stage_mosaic(entry, dirs):
+    with np.load(dirs["predictions"] / "predictions.npz") as data:
+        preds = dequantize_probabilities(data["pred_q"])
+    manifest = PatchStore(dirs["patches"] / "patch_store").manifest
+    mosaic = stitch_predictions(preds, manifest, entry["scene_id"])
+    out_dir = MAPS_DIR / entry["city"]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out = out_dir / f"{entry['scene_id']}_urban_probability.tif"
+    write_mosaic(mosaic, manifest, entry["scene_id"], out)
+    return out
+
+
+STAGE_FUNCS = {
+    "features": stage_features,
+    "patches": stage_patches,
+    "inference": stage_inference,
+    "metrics": stage_metrics,
+    "mosaic": stage_mosaic,
+}
+
+
+def run_scene(entry):
+    """Run every unfinished stage of one scene; returns the checkpoint"""
+    dirs = pipeline.scene_dirs(entry["city"], entry["scene_id"])
+    checkpoint = load_checkpoint(entry)
+    rerun = False
+
+    for stage in STAGES:
+        done = checkpoint.get(stage)
+        inputs = stage_inputs_hash(entry, stage)
+        # Once a stage re-runs, everything downstream of it is stale
+        if not rerun and done and Path(done["output"]).exists():
+            if done.get("inputs") == inputs:
+                continue
+            print(f"⚠️ {task_id(entry)}: inputs of '{stage}' changed, re-running from there")
+        rerun = True
+        start = time.perf_counter()
+        out = STAGE_FUNCS[stage](entry, dirs)
+        checkpoint[stage] = {"output": str(out), "inputs": inputs,
+                             "seconds": round(time.perf_counter() - start, 2)}
+        save_checkpoint(entry, checkpoint)
+    return checkpoint
+
+
+def _run_task(entry):
+    try:
+        return task_id(entry), run_scene(entry), None
+    except Exception:
+        return task_id(entry), None, traceback.format_exc()
+
+
+# ---------------------------
+# Batch
+# ---------------------------
+def run_batch(entries, max_workers=2):
+    """Fan scenes out over a process pool with at most max_workers running"""
+    results = {}
+    # "spawn" keeps TensorFlow state out of forked workers
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx) as pool:
+        futures = [pool.submit(_run_task, entry) for entry in entries]
+        for future in as_completed(futures):
+            tid, checkpoint, error = future.result()
+            if error:
+                print(f"❌ {tid} failed:\n{error}")
+            else:
+                print(f"✅ {tid} finished ({len(checkpoint)}/{len(STAGES)} stages)")
+            results[tid] = {"ok": error is None, "error": error}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the per-scene pipeline over a scene catalog")
+    parser.add_argument("catalog", help="JSON catalog of scenes")
+    parser.add_argument("--workers", type=int, default=2, help="Maximum concurrent scenes")
+    args = parser.parse_args()
+
+    entries = load_catalog(args.catalog)
+    print(f"🚀 Running {len(entries)} scenes with {args.workers} workers")
+    results = run_batch(entries, args.workers)
+
+    failed = [tid for tid, r in results.items() if not r["ok"]]
+    print(f"Done: {len(results) - len(failed)} ok, {len(failed)} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
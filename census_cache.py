@@ -0,0 +1,227 @@
+"""
+Columnar cache for census Excel workbooks.
+
+Each workbook sheet is parsed once with pd.read_excel and written as a
+typed Parquet file, sorted by (city, ward, year). A manifest records the
+source mtime, size and SHA-256, so refresh() only re-parses workbooks that
+actually changed. Lookups by city / ward / year go through a sorted
+in-memory index instead of re-reading Excel.
+
+Usage:
+    python census_cache.py                 # refresh the default workbooks
+"""
+import hashlib
+import json
+import os
+import pandas as pd
+from pathlib import Path
+
+from config import POPULATION_DIR, PROCESSED_DIR, CITY
+
+CACHE_DIR = PROCESSED_DIR / "census_cache"
+MANIFEST_PATH = CACHE_DIR / "manifest.json"
+
+CENSUS_YEAR = 2011
+INDEX_COLUMNS = ["city", "ward", "year"]
+
+# Primary Census Abstract workbook that notebooks/fix_excel.py cleans
+CENSUS_SOURCE_PATH = POPULATION_DIR / "PCA_CDB-2725-F-Census.xlsx"
+
+# Workbooks to ingest: path -> defaults for rows without city / year columns
+DEFAULT_WORKBOOKS = {
+    CENSUS_SOURCE_PATH: {"city": CITY, "year": CENSUS_YEAR},
+    POPULATION_DIR / "Updated_Pune_Population_Cleaned.xlsx": {"city": CITY, "year": CENSUS_YEAR},
+}
+
+# Original row position, so a sheet can be handed back as it was parsed
+SOURCE_ROW = "_source_row"
+
+# Source column names that map onto the index columns
+COLUMN_ALIASES = {
+    "city": ["city"],
+    "ward": ["ward", "ward_no", "ward no", "wardno"],
+    "year": ["year", "census_year"],
+}
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def index_renames(columns):
+    """{source column: index column} for columns matching COLUMN_ALIASES"""
+    lower = {str(c).strip().lower(): c for c in columns}
+    renames = {}
+    for target, aliases in COLUMN_ALIASES.items():
+        source = next((lower[a] for a in aliases if a in lower), None)
+        if source is not None:
+            renames[source] = target
+    return renames
+
+
+def normalize_sheet(df, city=None, year=None):
+    """Add city/ward/year index columns and give every column one dtype"""
+    df = df.rename(columns=index_renames(df.columns))
+
+    if "city" not in df.columns:
+        df["city"] = city
+    if "year" not in df.columns:
+        df["year"] = year
+    if "ward" not in df.columns:
+        df["ward"] = None
+
+    df["city"] = df["city"].astype("string")
+    wards = pd.to_numeric(df["ward"], errors="coerce")
+    if wards.notna().sum() == df["ward"].notna().sum() and (wards.dropna() % 1 == 0).all():
+        # Ward numbers read as floats (12.0) are keyed as "12"
+        df["ward"] = wards.astype("Int64")
+    df["ward"] = df["ward"].astype("string")
+    df["year"] = pd.to_numeric(df["year"], errors="coerce").astype("Int64")
+
+    for col in df.columns:
+        if col in INDEX_COLUMNS or df[col].dtype != object:
+            continue
+        numeric = pd.to_numeric(df[col], errors="coerce")
+        if numeric.notna().sum() == df[col].notna().sum():
+            df[col] = numeric
+        else:
+            # Mixed text/number columns are stored as strings
+            df[col] = df[col].astype("string")
+
+    df.columns = [str(c) for c in df.columns]
+    return df.sort_values(INDEX_COLUMNS, kind="stable").reset_index(drop=True)
+
+
+class CensusCache:
+    def __init__(self, workbooks=None, cache_dir=CACHE_DIR):
+        self.workbooks = {Path(p): d for p, d in (workbooks or DEFAULT_WORKBOOKS).items()}
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.cache_dir / MANIFEST_PATH.name
+        self.manifest = self.load_manifest()
+        self._tables = {}
+
+    def load_manifest(self):
+        if self.manifest_path.exists():
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        return {}
+
+    def save_manifest(self):
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def is_fresh(self, path):
+        """True if the cached copy of a workbook matches the source"""
+        entry = self.manifest.get(str(path))
+        if entry is None or "columns" not in entry:
+            return False
+        if not all((self.cache_dir / f).exists() for f in entry["sheets"].values()):
+            return False
+        stat = path.stat()
+        if entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            return True
+        # Touched but maybe not changed: compare content hash
+        if entry["sha256"] == file_sha256(path):
+            entry["mtime"], entry["size"] = stat.st_mtime, stat.st_size
+            self.save_manifest()
+            return True
+        return False
+
+    def ingest(self, path, defaults):
+        """Parse every sheet of a workbook once and write Parquet files"""
+        sheets = pd.read_excel(path, sheet_name=None)
+        stem = path.stem
+        files = {}
+        columns = {}
+        for name, df in sheets.items():
+            columns[name] = {
+                "source": [str(c) for c in df.columns],
+                "renamed": {target: str(source) for source, target in index_renames(df.columns).items()},
+            }
+            df = df.reset_index(drop=True)
+            df[SOURCE_ROW] = range(len(df))
+            table = normalize_sheet(df, defaults.get("city"), defaults.get("year"))
+            out = f"{stem}__{name}.parquet"
+            table.to_parquet(self.cache_dir / out, index=False)
+            files[name] = out
+
+        stat = path.stat()
+        self.manifest[str(path)] = {
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "sha256": file_sha256(path),
+            "sheets": files,
+            "columns": columns,
+        }
+        self.save_manifest()
+        self._tables = {k: v for k, v in self._tables.items() if k[0] != str(path)}
+        print(f"✅ Cached {len(files)} sheets from: {path.name}")
+
+    def refresh(self):
+        """Re-ingest only workbooks whose content changed"""
+        for path, defaults in self.workbooks.items():
+            if not path.exists():
+                print(f"❌ Census workbook not found: {path}")
+                continue
+            if not self.is_fresh(path):
+                self.ingest(path, defaults)
+        return self
+
+    def sheet_names(self):
+        return sorted({s for e in self.manifest.values() for s in e["sheets"]})
+
+    def table(self, sheet, columns=None):
+        """All cached rows of a sheet (across workbooks) as a DataFrame"""
+        frames = []
+        for path, entry in self.manifest.items():
+            if sheet not in entry["sheets"]:
+                continue
+            key = (path, sheet)
+            if key not in self._tables:
+                df = pd.read_parquet(self.cache_dir / entry["sheets"][sheet])
+                df = df.drop(columns=[SOURCE_ROW], errors="ignore")
+                self._tables[key] = df.set_index(INDEX_COLUMNS, drop=False).sort_index()
+            frames.append(self._tables[key])
+        if not frames:
+            raise KeyError(f"Sheet not cached: {sheet}")
+        df = frames[0] if len(frames) == 1 else pd.concat(frames).sort_index()
+        return df[columns] if columns else df
+
+    def source_sheet(self, path, sheet):
+        """One workbook sheet with its original columns and row order (from cache)"""
+        entry = self.manifest[str(Path(path))]
+        columns = entry["columns"][sheet]
+        df = pd.read_parquet(self.cache_dir / entry["sheets"][sheet])
+        df = df.sort_values(SOURCE_ROW).reset_index(drop=True)
+        df = df.rename(columns=columns["renamed"])
+        return df[columns["source"]]
+
+    def lookup(self, sheet, city=None, ward=None, year=None, columns=None):
+        """Rows matching city / ward / year (None = any) via the sorted index"""
+        df = self.table(sheet, columns=None)
+        ward = None if ward is None else str(ward)
+        key = tuple(slice(None) if v is None else v for v in (city, ward, year))
+        try:
+            rows = df.loc[key, :]
+        except KeyError:
+            rows = df.iloc[0:0]
+        rows = rows.reset_index(drop=True)
+        return rows[columns] if columns else rows
+
+
+def load_census(sheet, **filters):
+    """Refresh the default cache and return matching rows of a sheet"""
+    return CensusCache().refresh().lookup(sheet, **filters)
+
+
+if __name__ == "__main__":
+    cache = CensusCache().refresh()
+    for sheet in cache.sheet_names():
+        print(f"{sheet}: {len(cache.table(sheet))} rows")
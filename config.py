@@ -16,10 +16,24 @@ PREDICTIONS_DIR = DATA_DIR / "predictions"
 OUTPUTS_DIR = BASE_DIR / "outputs"
 MAPS_DIR = OUTPUTS_DIR / "maps"
 CHARTS_DIR = OUTPUTS_DIR / "charts"
+CHECKPOINTS_DIR = OUTPUTS_DIR / "checkpoints"
+
+# Default scene / city (batch runs take these from a catalog instead)
+CITY = "Pune"
+SCENE_ID = "LC09_L2SP_147047_20250902_20250904_02_T2"
+POP_YEARS = [2000, 2005, 2010, 2015, 2020]
+PATCH_SIZE = 64
+
+# Projected urban growth (% built-up) shown by the dashboard and reports
+GROWTH_TREND_YEARS = [2000, 2005, 2010, 2015, 2020, 2025, 2030, 2035, 2040]
+GROWTH_TREND = [10, 18, 25, 40, 55, 68, 78, 85, 88]
+
+# Tiles with a smaller share of clear (QA_PIXEL) pixels are skipped
+MIN_VALID_FRACTION = 0.5
 
 # Create directories safely
 for d in [
     PROCESSED_DIR, PATCHES_DIR, MODELS_DIR,
-    PREDICTIONS_DIR, MAPS_DIR, CHARTS_DIR
+    PREDICTIONS_DIR, MAPS_DIR, CHARTS_DIR, CHECKPOINTS_DIR
 ]:
     d.mkdir(parents=True, exist_ok=True)
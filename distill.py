@@ -0,0 +1,135 @@
+"""
+Distill the U-Net into a lightweight student for high-throughput scoring.
+
+The saved urban_growth_unet.h5 teacher labels the existing train/val
+patch splits with soft probabilities; build_student_unet is trained on
+them blended with the splits' urban masks (alpha = teacher weight).
+Teacher targets are produced per batch inside the tf.data pipeline, so
+neither the float32 splits nor their targets are held in memory. Both
+models are then scored against the test split's masks with the same
+packed-store metrics the dashboard uses, timed for throughput, and
+registered in the model registry. Their test predictions are saved per
+model for the dashboard's model selector.
+
+The teacher must have been trained on the current split (registry
+split_id); the student is registered with the same split.
+
+Usage:
+    python distill.py --epochs 10 --alpha 0.7
+"""
+import argparse
+import time
+
+from unet import build_student_unet, load_split, split_dataset, current_split_id, STUDENT_PATH
+from pipeline import load_unet
+from prediction_store import store_metrics
+from test_predictions import write_test_predictions, require_split
+from model_registry import load_registry, model_path, register_model, DEFAULT_MODEL
+
+STUDENT_MODEL = "unet_lite"
+
+
+def with_teacher_targets(dataset, teacher, alpha):
+    """Replace each batch's masks with teacher probabilities blended with them"""
+    def blend(X, y):
+        return X, alpha * teacher(X, training=False) + (1 - alpha) * y
+    return dataset.map(blend)
+
+
+def measure_throughput(model, X, batch_size=64, repeats=3):
+    """Tiles per wall-clock second and per CPU second (best of repeats)"""
+    model.predict(X[:batch_size], batch_size=batch_size, verbose=0)  # warm-up
+    best_wall = best_cpu = float("inf")
+    for _ in range(repeats):
+        wall, cpu = time.perf_counter(), time.process_time()
+        model.predict(X, batch_size=batch_size, verbose=0)
+        best_wall = min(best_wall, time.perf_counter() - wall)
+        best_cpu = min(best_cpu, time.process_time() - cpu)
+    return {
+        "tiles_per_sec": round(len(X) / best_wall, 1),
+        "tiles_per_cpu_sec": round(len(X) / max(best_cpu, 1e-9), 1),
+    }
+
+
+def evaluate(model_name, weights):
+    """IoU / F1 / ... on the test split, through the same packed-store metrics
+    as the dashboard; also writes the model's test predictions for it"""
+    metrics = store_metrics(write_test_predictions(model_name, weights))
+    return {k: round(v, 4) for k, v in metrics.items()}
+
+
+def distill(epochs=10, batch_size=32, alpha=0.7, filters=(8, 16, 32)):
+    """Train the student on teacher targets; returns (teacher, student)"""
+    # The student reads the same bands as the teacher
+    road_network = load_registry()[DEFAULT_MODEL].get("road_network", False)
+    # A teacher that saw the test tiles would leak them into the student
+    require_split(DEFAULT_MODEL, current_split_id(road_network=road_network)[1])
+    teacher = load_unet(model_path(DEFAULT_MODEL))
+
+    # Soft teacher targets blended with the hard urban masks, batch by batch
+    train_ds = with_teacher_targets(
+        split_dataset("train", batch_size, shuffle=True, road_network=road_network), teacher, alpha)
+    val_ds = with_teacher_targets(split_dataset("val", batch_size, road_network=road_network), teacher, alpha)
+
+    input_shape = tuple(train_ds.element_spec[0].shape[1:])
+    student = build_student_unet(input_shape, filters)
+    student.fit(
+        train_ds,
+        validation_data=val_ds,
+        epochs=epochs
+    )
+    student.save(STUDENT_PATH)
+    scheme, split_id = current_split_id(road_network=road_network)
+    register_model(STUDENT_MODEL, STUDENT_PATH, architecture="student_unet",
+                   input_shape=list(input_shape), road_network=road_network,
+                   split_scheme=scheme, split_id=split_id)
+    print("✅ Student model saved at:", STUDENT_PATH)
+    return teacher, student
+
+
+def compare_and_register(teacher, student, filters=(8, 16, 32)):
+    """Score both models on the test split and record them in the registry"""
+    road_network = load_registry()[DEFAULT_MODEL].get("road_network", False)
+    X_test, y_test = load_split("test", road_network=road_network)
+    if y_test is None or not y_test.any():
+        # Scoring against teacher outputs would rate the teacher 1.0
+        raise ValueError("Test split has no urban masks; refusing to register metrics")
+
+    rows = {}
+    for name, model, path, arch in (
+        (DEFAULT_MODEL, teacher, model_path(DEFAULT_MODEL), "simple_unet"),
+        (STUDENT_MODEL, student, STUDENT_PATH, "student_unet"),
+    ):
+        info = {
+            "architecture": arch,
+            "params": int(model.count_params()),
+            "metrics": evaluate(name, path),
+            **measure_throughput(model, X_test),
+        }
+        if name == STUDENT_MODEL:
+            info.update({"teacher": DEFAULT_MODEL, "filters": list(filters)})
+        register_model(name, path, **info)
+        rows[name] = info
+
+    print(f"{'model':<12}{'params':>10}{'IoU':>8}{'F1':>8}{'tiles/s':>10}{'tiles/cpu-s':>13}")
+    for name, info in rows.items():
+        print(f"{name:<12}{info['params']:>10}{info['metrics']['iou']:>8.4f}{info['metrics']['f1_score']:>8.4f}"
+              f"{info['tiles_per_sec']:>10.1f}{info['tiles_per_cpu_sec']:>13.1f}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill the U-Net into a lightweight student")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--alpha", type=float, default=0.7, help="Weight of teacher targets vs hard masks")
+    parser.add_argument("--filters", type=int, nargs=3, default=[8, 16, 32])
+    args = parser.parse_args()
+
+    filters = tuple(args.filters)
+    teacher, student = distill(args.epochs, args.batch_size, args.alpha, filters)
+    compare_and_register(teacher, student, filters)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Compact feature-stack store.
+
+The full-scene feature stack is saved as uint16 codes with a per-band
+scale and offset (value = code * scale + offset) instead of float32. The
+codes are laid out tile by tile, (tile_rows, tile_cols, P, P, bands), in a
+plain .npy file, so each patch is one contiguous chunk and the store can
+be memory-mapped. Patching, training and inference dequantize one batch
+at a time.
+
+Layout of a store directory:
+    meta.json    shape, band names, scale/offset per band, chunk size
+    codes.npy    uint16 tiles (memory-mappable)
+    <mask>.npy   optional per-pixel masks (e.g. the QA usable mask)
+
+Usage:
+    python feature_store.py         # convert data/processed/features_stack.npz
+"""
+import json
+import numpy as np
+from pathlib import Path
+
+from config import PROCESSED_DIR, POP_YEARS, PATCH_SIZE
+
+BAND_NAMES = [f"pop_{year}" for year in POP_YEARS] + ["dist_to_road", "ndvi"]
+CODE_DTYPE = np.uint16
+CODE_MAX = np.iinfo(CODE_DTYPE).max
+
+DENSE_FEATURES_PATH = PROCESSED_DIR / "features_stack.npz"
+FEATURE_STORE_PATH = PROCESSED_DIR / "features_store"
+NETWORK_FEATURE_STORE_PATH = PROCESSED_DIR / "features_store_network"
+
+
+# ---------------------------
+# Encoding
+# ---------------------------
+def band_encoding(features):
+    """Per-band (scale, offset) mapping each band's range onto uint16"""
+    lo = np.nanmin(features, axis=(0, 1)).astype("float64")
+    hi = np.nanmax(features, axis=(0, 1)).astype("float64")
+    scale = np.where(hi > lo, (hi - lo) / CODE_MAX, 1.0)
+    return scale, lo
+
+
+def quantize(values, scale, offset):
+    """Float values -> uint16 codes (NaN becomes the band minimum)
+
+    Missing pixels are flagged by the store's "usable" mask, not by their code.
+    """
+    codes = np.rint((np.nan_to_num(values, nan=offset) - offset) / scale)
+    return np.clip(codes, 0, CODE_MAX).astype(CODE_DTYPE)
+
+
+def dequantize(codes, scale, offset):
+    """uint16 codes -> float32 values (scale/offset broadcast over the band axis)"""
+    return (codes.astype("float32") * np.asarray(scale, dtype="float32")
+            + np.asarray(offset, dtype="float32"))
+
+
+def iter_dequantized(codes, scale, offset, batch_size=32):
+    """Yield float32 batches from an (N, ...) code array"""
+    for start in range(0, len(codes), batch_size):
+        yield dequantize(codes[start:start + batch_size], scale, offset)
+
+
+def normalized_encoding(codes):
+    """(scale, offset) turning patch codes straight into per-band [0, 1] values
+
+    Same result as normalize_patches on the dequantized patches: the
+    quantization is affine, so min-max normalizing the codes is equivalent.
+    """
+    if len(codes) == 0:
+        n_bands = codes.shape[-1]
+        return np.ones(n_bands), np.zeros(n_bands)
+    axes = tuple(range(codes.ndim - 1))
+    lo = codes.min(axis=axes).astype("float64")
+    hi = codes.max(axis=axes).astype("float64")
+    span = np.where(hi > lo, hi - lo, 1.0)
+    return 1.0 / span, -lo / span
+
+
+# ---------------------------
+# Store
+# ---------------------------
+def write_feature_store(features, path=FEATURE_STORE_PATH, band_names=BAND_NAMES,
+                        chunk=PATCH_SIZE, masks=None):
+    """Quantize an (H, W, B) stack and write it tile by tile"""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    H, W, B = features.shape
+    tile_rows, tile_cols = -(-H // chunk), -(-W // chunk)
+    scale, offset = band_encoding(features)
+
+    codes = np.lib.format.open_memmap(
+        path / "codes.npy", mode="w+", dtype=CODE_DTYPE,
+        shape=(tile_rows, tile_cols, chunk, chunk, B)
+    )
+    for r in range(tile_rows):
+        block = features[r * chunk:(r + 1) * chunk]
+        padded = np.zeros((chunk, tile_cols * chunk, B), dtype=CODE_DTYPE)
+        padded[:block.shape[0], :W] = quantize(block, scale, offset)
+        codes[r] = padded.reshape(chunk, tile_cols, chunk, B).transpose(1, 0, 2, 3)
+    codes.flush()
+    del codes
+
+    masks = dict(masks or {})
+    if "usable" not in masks:
+        # Missing (NaN) values, e.g. QA-masked NDVI, would otherwise be
+        # indistinguishable from the band minimum they are coded as
+        finite = np.isfinite(features).all(axis=-1)
+        if not finite.all():
+            masks["usable"] = finite
+    for name, mask in masks.items():
+        np.save(path / f"{name}.npy", mask)
+
+    meta = {
+        "shape": [H, W, B],
+        "chunk": chunk,
+        "bands": list(band_names)[:B],
+        "dtype": np.dtype(CODE_DTYPE).name,
+        "scale": scale.tolist(),
+        "offset": offset.tolist(),
+        "masks": sorted(masks),
+    }
+    with open(path / "meta.json", "w") as f:
+        json.dump(meta, f, indent=2)
+    return FeatureStore(path)
+
+
+class FeatureStore:
+    def __init__(self, path=FEATURE_STORE_PATH):
+        self.path = Path(path)
+        with open(self.path / "meta.json") as f:
+            self.meta = json.load(f)
+        self.shape = tuple(self.meta["shape"])
+        self.chunk = self.meta["chunk"]
+        self.bands = self.meta["bands"]
+        self.scale = np.array(self.meta["scale"])
+        self.offset = np.array(self.meta["offset"])
+        self.codes = np.load(self.path / "codes.npy", mmap_mode="r")
+        self.tile_grid = self.codes.shape[:2]
+
+    @property
+    def n_tiles(self):
+        """Number of full tiles (the ones create_patches would cut)"""
+        return (self.shape[0] // self.chunk) * (self.shape[1] // self.chunk)
+
+    def to_store_index(self, tile_index):
+        """create_patches tile numbers -> tile numbers in the (padded) store grid"""
+        cols = self.shape[1] // self.chunk
+        r, c = np.divmod(np.asarray(tile_index), cols)
+        return r * self.tile_grid[1] + c
+
+    def tile_codes(self, tile_index=None):
+        """uint16 codes for tiles (create_patches numbering), read from the memmap"""
+        flat = self.codes.reshape((-1, self.chunk, self.chunk, self.shape[2]))
+        if tile_index is None:
+            tile_index = np.arange(self.n_tiles)
+        return flat[self.to_store_index(tile_index)]
+
+    def read_tiles(self, tile_index=None):
+        """Dequantized float32 patches (N, P, P, B)"""
+        return dequantize(self.tile_codes(tile_index), self.scale, self.offset)
+
+    def iter_tiles(self, tile_index=None, batch_size=256):
+        """Dequantized patches, one batch at a time"""
+        tile_index = np.arange(self.n_tiles) if tile_index is None else np.asarray(tile_index)
+        for start in range(0, len(tile_index), batch_size):
+            yield self.read_tiles(tile_index[start:start + batch_size])
+
+    def read_window(self, row0, row1, col0, col1):
+        """Dequantized (rows, cols, B) pixel window of the original stack"""
+        P = self.chunk
+        tr0, tr1 = row0 // P, -(-row1 // P)
+        tc0, tc1 = col0 // P, -(-col1 // P)
+        tiles = np.asarray(self.codes[tr0:tr1, tc0:tc1])
+        block = tiles.transpose(0, 2, 1, 3, 4).reshape((tr1 - tr0) * P, (tc1 - tc0) * P, -1)
+        block = block[row0 - tr0 * P:row1 - tr0 * P, col0 - tc0 * P:col1 - tc0 * P]
+        return dequantize(block, self.scale, self.offset)
+
+    def to_array(self):
+        """Whole stack as float32 (H, W, B)"""
+        return self.read_window(0, self.shape[0], 0, self.shape[1])
+
+    def mask(self, name):
+        return np.load(self.path / f"{name}.npy")
+
+    def has_mask(self, name):
+        return name in self.meta.get("masks", [])
+
+
+def convert_npz(src=DENSE_FEATURES_PATH, dst=FEATURE_STORE_PATH):
+    """Convert a float features_stack.npz (notebook 04) into a feature store"""
+    with np.load(src) as data:
+        features = data["features"]
+    return write_feature_store(features, dst)
+
+
+def add_network_bands(features, city, meta, dst=NETWORK_FEATURE_STORE_PATH):
+    """Copy of a feature store with the road centrality bands
+    (road_network.NETWORK_BAND_NAMES) appended, on the scene grid of meta"""
+    from road_network import network_layers, NETWORK_BAND_NAMES
+
+    layers = network_layers(city, meta)
+    if tuple(layers.shape[:2]) != tuple(features.shape[:2]):
+        raise ValueError(f"Road network layers {layers.shape[:2]} do not match the "
+                         f"feature grid {features.shape[:2]}")
+    stack = np.concatenate([features.to_array(), np.asarray(layers, dtype="float32")], axis=-1)
+    masks = {"usable": features.mask("usable")} if features.has_mask("usable") else None
+    return write_feature_store(stack, dst, features.bands + NETWORK_BAND_NAMES, features.chunk, masks)
+
+
+if __name__ == "__main__":
+    store = convert_npz()
+    print(f"✅ Feature store written: {store.path} ({store.codes.nbytes / 1e6:.1f} MB codes)")
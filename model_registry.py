@@ -0,0 +1,60 @@
+"""
+Registry of trained models.
+
+A small JSON file (data/models/registry.json) maps a model name to its
+weights file plus whatever was measured about it (architecture, parameter
+count, IoU / F1, tiles per second). The dashboard predictor and the batch
+pipeline look models up by name.
+"""
+import json
+import os
+
+from config import MODELS_DIR
+
+REGISTRY_PATH = MODELS_DIR / "registry.json"
+DEFAULT_MODEL = "unet"
+
+# Always available, even before anything has been registered
+BUILTIN_MODELS = {
+    "unet": {"path": "urban_growth_unet.h5", "architecture": "simple_unet"},
+}
+
+
+def load_registry(path=REGISTRY_PATH):
+    registry = {name: dict(info) for name, info in BUILTIN_MODELS.items()}
+    if path.exists():
+        with open(path) as f:
+            for name, info in json.load(f).items():
+                registry.setdefault(name, {}).update(info)
+    return registry
+
+
+def save_registry(registry, path=REGISTRY_PATH):
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp, path)
+
+
+def register_model(name, path, **info):
+    """Add or update a model entry (path relative to MODELS_DIR when inside it)"""
+    registry = load_registry()
+    try:
+        path = path.relative_to(MODELS_DIR)
+    except (AttributeError, ValueError):
+        pass
+    registry.setdefault(name, {}).update({"path": str(path), **info})
+    save_registry(registry)
+    return registry[name]
+
+
+def model_names():
+    return sorted(load_registry())
+
+
+def model_path(name=DEFAULT_MODEL):
+    """Absolute weights path of a registered model"""
+    registry = load_registry()
+    if name not in registry:
+        raise KeyError(f"Unknown model '{name}'. Registered: {', '.join(sorted(registry))}")
+    return MODELS_DIR / registry[name]["path"]
@@ -1,5 +1,12 @@
+import sys
+from pathlib import Path
+
 import pandas as pd
 
+# Project root (config, census_cache)
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from census_cache import CensusCache, CENSUS_SOURCE_PATH
+
 # Official summary data for full Pune district 2011 (confirmed from censusindia.gov.in)
 summary_data = {
     'city': ['Pune'],
@@ -15,12 +22,12 @@ summary_data = {
 }
 summary_df = pd.DataFrame(summary_data)
 
-# Read raw data (will work if file is in same folder or use full path)
-raw_df = pd.read_excel('PCA_CDB-2725-F-Census.xlsx', sheet_name='EB-2725')
+# Read raw data through the census cache (Excel is parsed only when it changed)
+raw_df = CensusCache().refresh().source_sheet(CENSUS_SOURCE_PATH, 'EB-2725')
 
 # Create updated file
-with pd.ExcelWriter('Updated_Pune_Population_Cleaned.xlsx') as writer:
+with pd.ExcelWriter(CENSUS_SOURCE_PATH.parent / 'Updated_Pune_Population_Cleaned.xlsx') as writer:
     raw_df.to_excel(writer, sheet_name='Raw_Pune_Data', index=False)
     summary_df.to_excel(writer, sheet_name='Pune_Summary', index=False)
 
-print("Updated Excel created successfully in the current folder!")
\ No newline at end of file
+print("Updated Excel created successfully in:", CENSUS_SOURCE_PATH.parent)
\ No newline at end of file
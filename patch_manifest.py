@@ -0,0 +1,207 @@
+"""
+Georeferenced patch manifest and spatial index.
+
+Every patch keeps its scene ID, tile grid position, pixel offset and
+geotransform, so a prediction can be put back on the map. PatchIndex is a
+grid index over the manifest: patches of a scene sit on a regular tile
+grid, so a point or bounding-box query is an inverse geotransform plus a
+lookup-table slice (no scan over all patches). stitch_predictions places
+patch predictions back into a scene mosaic.
+"""
+import json
+import numpy as np
+
+from config import PATCH_SIZE
+
+
+def transform_tuple(transform):
+    """(a, b, c, d, e, f) from a rasterio Affine (x = a*col + b*row + c, y = d*col + e*row + f)"""
+    return [float(v) for v in tuple(transform)[:6]]
+
+
+class PatchManifest:
+    """Columnar per-patch records; row i describes sample i of a patch set"""
+
+    def __init__(self, scene_id, city, row_off, col_off, scenes, patch_size=PATCH_SIZE, split_id=None):
+        self.scene_id = np.asarray(scene_id, dtype=str)
+        self.city = np.asarray(city, dtype=str)
+        self.row_off = np.asarray(row_off, dtype=np.int64)
+        self.col_off = np.asarray(col_off, dtype=np.int64)
+        self.scenes = scenes            # scene_id -> {"transform", "crs", "height", "width"}
+        self.patch_size = int(patch_size)
+        self.split_id = split_id        # PatchStore.split_id of the split these rows come from
+
+    @classmethod
+    def from_tiles(cls, city, scene_id, meta, tile_index, patch_size=PATCH_SIZE):
+        """Manifest for tiles cut by create_patches (row-major tile numbers)"""
+        cols = meta["width"] // patch_size
+        tile_row, tile_col = np.divmod(np.asarray(tile_index, dtype=np.int64), cols)
+        n = len(tile_row)
+        scenes = {scene_id: {
+            "transform": transform_tuple(meta["transform"]),
+            "crs": None if meta["crs"] is None else str(meta["crs"]),
+            "height": int(meta["height"]),
+            "width": int(meta["width"]),
+        }}
+        return cls([scene_id] * n, [city] * n, tile_row * patch_size, tile_col * patch_size,
+                   scenes, patch_size)
+
+    @classmethod
+    def concat(cls, manifests):
+        scenes = {}
+        for m in manifests:
+            scenes.update(m.scenes)
+        # A split id only survives if every part comes from the same split
+        split_ids = {m.split_id for m in manifests}
+        return cls(
+            np.concatenate([m.scene_id for m in manifests]),
+            np.concatenate([m.city for m in manifests]),
+            np.concatenate([m.row_off for m in manifests]),
+            np.concatenate([m.col_off for m in manifests]),
+            scenes, manifests[0].patch_size,
+            split_ids.pop() if len(split_ids) == 1 else None,
+        )
+
+    def __len__(self):
+        return len(self.row_off)
+
+    @property
+    def georeferenced(self):
+        """True when every scene has a CRS (pixel-grid manifests have none)"""
+        return all(info["crs"] is not None for info in self.scenes.values())
+
+    def subset(self, index):
+        """Manifest rows in the given order (e.g. a split or a shuffle)"""
+        index = np.asarray(index)
+        return PatchManifest(self.scene_id[index], self.city[index], self.row_off[index],
+                             self.col_off[index], self.scenes, self.patch_size, self.split_id)
+
+    def save(self, path):
+        extra = {} if self.split_id is None else {"split_id": self.split_id}
+        np.savez(path, scene_id=self.scene_id, city=self.city,
+                 row_off=self.row_off, col_off=self.col_off,
+                 patch_size=self.patch_size, scenes=json.dumps(self.scenes), **extra)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            split_id = str(data["split_id"]) if "split_id" in data.files else None
+            scenes = json.loads(str(data["scenes"]))
+            # Older manifests stored a missing CRS as the string "None"
+            for info in scenes.values():
+                if info["crs"] == "None":
+                    info["crs"] = None
+            return cls(data["scene_id"], data["city"], data["row_off"], data["col_off"],
+                       scenes, int(data["patch_size"]), split_id)
+
+    def tile_index(self):
+        """Row-major tile numbers (create_patches order) of every patch in its scene"""
+        P = self.patch_size
+        cols = np.array([self.scenes[s]["width"] // P for s in self.scene_id], dtype=np.int64)
+        return (self.row_off // P) * cols + self.col_off // P
+
+    def patch_transform(self, i):
+        """Geotransform (a, b, c, d, e, f) of patch i"""
+        a, b, c, d, e, f = self.scenes[self.scene_id[i]]["transform"]
+        r, q = int(self.row_off[i]), int(self.col_off[i])
+        return [a, b, c + a * q + b * r, d, e, f + d * q + e * r]
+
+    def bounds(self, i):
+        """(minx, miny, maxx, maxy) of patch i in its scene CRS"""
+        a, b, c, d, e, f = self.patch_transform(i)
+        P = self.patch_size
+        xs = [c, c + a * P, c + b * P, c + a * P + b * P]
+        ys = [f, f + d * P, f + e * P, f + d * P + e * P]
+        return min(xs), min(ys), max(xs), max(ys)
+
+
+def to_crs(xs, ys, src_crs, dst_crs):
+    """Reproject coordinate lists (no-op when the CRS already matches)
+
+    src_crs None means the coordinates are already in dst_crs; a None
+    dst_crs (scene without a CRS) cannot be reprojected into.
+    """
+    if src_crs is None or str(src_crs) == str(dst_crs):
+        return list(xs), list(ys)
+    if dst_crs is None:
+        raise ValueError(f"Cannot reproject from {src_crs}: scene has no CRS")
+    from rasterio.warp import transform
+
+    return transform(src_crs, dst_crs, list(xs), list(ys))
+
+
+class PatchIndex:
+    """Grid index answering "which patches cover this point / box" """
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+        P = manifest.patch_size
+        self.grids = {}
+        for scene_id, info in manifest.scenes.items():
+            rows = manifest.scene_id == scene_id
+            ids = np.flatnonzero(rows)
+            grid = np.full((info["height"] // P, info["width"] // P), -1, dtype=np.int64)
+            grid[manifest.row_off[ids] // P, manifest.col_off[ids] // P] = ids
+            a, b, c, d, e, f = info["transform"]
+            inverse = np.linalg.inv(np.array([[a, b], [d, e]]))
+            self.grids[scene_id] = (grid, inverse, np.array([c, f]), info["crs"])
+
+    def _pixel(self, scene_id, xs, ys, crs):
+        grid, inverse, origin, scene_crs = self.grids[scene_id]
+        xs, ys = to_crs(xs, ys, crs, scene_crs)
+        colrow = inverse @ (np.vstack([xs, ys]) - origin[:, None])
+        return colrow[0], colrow[1]
+
+    def query_point(self, x, y, crs=None):
+        """Manifest row ids of patches containing (x, y)"""
+        P = self.manifest.patch_size
+        hits = []
+        for scene_id, (grid, *_rest) in self.grids.items():
+            col, row = self._pixel(scene_id, [x], [y], crs)
+            tr, tc = int(np.floor(row[0] / P)), int(np.floor(col[0] / P))
+            if 0 <= tr < grid.shape[0] and 0 <= tc < grid.shape[1] and grid[tr, tc] >= 0:
+                hits.append(int(grid[tr, tc]))
+        return hits
+
+    def query_bbox(self, minx, miny, maxx, maxy, crs=None):
+        """Manifest row ids of patches intersecting a bounding box"""
+        P = self.manifest.patch_size
+        hits = []
+        for scene_id, (grid, *_rest) in self.grids.items():
+            cols, rows = self._pixel(scene_id, [minx, maxx, minx, maxx], [miny, miny, maxy, maxy], crs)
+            tr0 = max(int(np.floor(rows.min() / P)), 0)
+            tr1 = min(int(np.floor(rows.max() / P)) + 1, grid.shape[0])
+            tc0 = max(int(np.floor(cols.min() / P)), 0)
+            tc1 = min(int(np.floor(cols.max() / P)) + 1, grid.shape[1])
+            if tr0 >= tr1 or tc0 >= tc1:
+                continue
+            block = grid[tr0:tr1, tc0:tc1]
+            hits.extend(int(i) for i in block[block >= 0])
+        return hits
+
+
+def stitch_predictions(predictions, manifest, scene_id, fill=np.nan):
+    """Place (N, P, P[, 1]) patch predictions back into a (H, W) scene mosaic"""
+    info = manifest.scenes[scene_id]
+    P = manifest.patch_size
+    mosaic = np.full((info["height"], info["width"]), fill, dtype="float32")
+    for i in np.flatnonzero(manifest.scene_id == scene_id):
+        r, c = manifest.row_off[i], manifest.col_off[i]
+        mosaic[r:r + P, c:c + P] = predictions[i].reshape(P, P)
+    return mosaic
+
+
+def write_mosaic(mosaic, manifest, scene_id, path):
+    """Save a stitched mosaic as a single-band GeoTIFF on the scene grid"""
+    import rasterio
+    from rasterio.transform import Affine
+
+    info = manifest.scenes[scene_id]
+    profile = {
+        "driver": "GTiff", "dtype": "float32", "count": 1,
+        "height": info["height"], "width": info["width"],
+        "crs": info["crs"], "transform": Affine(*info["transform"]),
+        "nodata": np.nan, "compress": "deflate",
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(mosaic.astype("float32"), 1)
@@ -0,0 +1,168 @@
+"""
+Single on-disk patch store.
+
+All patches of a dataset live in one uncompressed, memory-mappable
+uint16 array with a per-band scale/offset (see feature_store), next to the
+patch manifest and optional labels. Train/val/test splits are index
+arrays over this store (see splits.py), so loaders read batches through
+the indices instead of materializing a copy per split.
+
+Layout of a store directory:
+    codes.npy            (N, P, P, B) uint16 patch codes
+    meta.json            scale / offset per band, bands, patch size
+    manifest.npz         PatchManifest (scene position of each patch)
+    labels.npy           (N, P, P, 1) uint8 urban masks (percentile_labels)
+    valid_fraction.npy   optional QA valid fraction per patch (training weight)
+    splits/<name>.npz    index splits
+"""
+import hashlib
+import json
+import numpy as np
+from pathlib import Path
+
+from config import PATCHES_DIR
+from feature_store import dequantize
+from patch_manifest import PatchManifest
+
+PATCH_STORE_PATH = PATCHES_DIR / "patch_store"
+# Same tiles with the three road network bands appended (10 bands)
+NETWORK_PATCH_STORE_PATH = PATCHES_DIR / "patch_store_network"
+
+# Urban masks of the training script: band 0 above its 70th percentile
+LABEL_BAND = 0
+LABEL_PERCENTILE = 70
+
+
+def patch_store_path(road_network=False):
+    """Patch store of the base feature bands, or of base + road network bands"""
+    return NETWORK_PATCH_STORE_PATH if road_network else PATCH_STORE_PATH
+
+
+def percentile_labels(patches, band=LABEL_BAND, percentile=LABEL_PERCENTILE):
+    """(N, P, P, 1) uint8 urban masks from a patch band's percentile
+
+    Works on float patches and on uint16 codes alike (the encoding is
+    monotonic). The percentile is taken over the whole store, so the
+    masks do not depend on the split.
+    """
+    values = patches[..., band]
+    return (values > np.percentile(values, percentile)).astype(np.uint8)[..., np.newaxis]
+
+
+def write_patch_store(path, codes, scale, offset, manifest=None, labels=None,
+                      valid_fraction=None, bands=None):
+    """Write patch codes (and their manifest / labels) as one store"""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    np.save(path / "codes.npy", np.ascontiguousarray(codes))
+    if manifest is not None:
+        manifest.save(path / "manifest.npz")
+    if labels is not None:
+        np.save(path / "labels.npy", (np.asarray(labels) > 0.5).astype(np.uint8))
+    if valid_fraction is not None:
+        np.save(path / "valid_fraction.npy", np.asarray(valid_fraction, dtype="float32"))
+
+    meta = {
+        "n_patches": int(codes.shape[0]),
+        "patch_shape": list(codes.shape[1:]),
+        "scale": np.asarray(scale, dtype="float64").tolist(),
+        "offset": np.asarray(offset, dtype="float64").tolist(),
+        "bands": list(bands) if bands is not None else None,
+    }
+    with open(path / "meta.json", "w") as f:
+        json.dump(meta, f, indent=2)
+    return PatchStore(path)
+
+
+class PatchStore:
+    def __init__(self, path=PATCH_STORE_PATH):
+        self.path = Path(path)
+        with open(self.path / "meta.json") as f:
+            self.meta = json.load(f)
+        self.scale = np.array(self.meta["scale"])
+        self.offset = np.array(self.meta["offset"])
+        self.codes = np.load(self.path / "codes.npy", mmap_mode="r")
+        labels_path = self.path / "labels.npy"
+        self.labels = np.load(labels_path, mmap_mode="r") if labels_path.exists() else None
+        self._manifest = None
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    @property
+    def patch_shape(self):
+        return self.codes.shape[1:]
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            self._manifest = PatchManifest.load(self.path / "manifest.npz")
+        return self._manifest
+
+    @property
+    def valid_fraction(self):
+        """QA valid fraction per patch, or None when the store has none"""
+        path = self.path / "valid_fraction.npy"
+        return np.load(path) if path.exists() else None
+
+    def read(self, index):
+        """Dequantized patches (and labels or None) for indices, in the given order"""
+        index = np.asarray(index)
+        # Read the memmap in ascending order, then restore the requested order
+        order = np.argsort(index, kind="stable")
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        sorted_index = index[order]
+        X = dequantize(self.codes[sorted_index], self.scale, self.offset)[inverse]
+        y = None if self.labels is None else self.labels[sorted_index][inverse].astype("float32")
+        return X, y
+
+    def iter_batches(self, index, batch_size=32, shuffle=False, seed=None, weighted=False):
+        """(X, y) batches over a split's indices; nothing beyond a batch is copied
+
+        weighted=True adds a per-patch sample weight, the QA valid fraction
+        shaped (n, 1, 1) to broadcast over the per-pixel loss, so partly
+        cloudy patches count for less.
+        """
+        index = np.asarray(index)
+        if shuffle:
+            index = np.random.default_rng(seed).permutation(index)
+        weights = self.valid_fraction if weighted else None
+        if weighted and weights is None:
+            weights = np.ones(len(self), dtype="float32")
+        for start in range(0, len(index), batch_size):
+            batch = index[start:start + batch_size]
+            if weighted:
+                yield self.read(batch) + (weights[batch].reshape(-1, 1, 1).astype("float32"),)
+            else:
+                yield self.read(batch)
+
+    def split_path(self, scheme):
+        return self.path / "splits" / f"{scheme}.npz"
+
+    def has_split(self, scheme):
+        return self.split_path(scheme).exists()
+
+    def load_split(self, scheme):
+        """{"train": idx, "val": idx, "test": idx, ...} for a split scheme"""
+        with np.load(self.split_path(scheme)) as data:
+            return {k: data[k] for k in data.files if k != "params"}
+
+    def split_id(self, scheme):
+        """Short hash of a split's indices and parameters
+
+        Files derived from one split (test predictions, their manifest) carry
+        it, so mismatched pairs can be detected.
+        """
+        h = hashlib.sha256(f"{len(self)}:{scheme}".encode())
+        with np.load(self.split_path(scheme)) as data:
+            for k in sorted(data.files):
+                h.update(k.encode())
+                h.update(np.ascontiguousarray(data[k]).tobytes())
+        return h.hexdigest()[:16]
+
+    def save_split(self, scheme, splits, **params):
+        path = self.split_path(scheme)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, params=json.dumps(params), **{k: np.asarray(v, dtype=np.int64) for k, v in splits.items()})
+        return path
@@ -0,0 +1,224 @@
+"""
+Per-scene pipeline stages (features → patches → inference → metrics).
+
+Same processing as notebooks 02-07, parameterised by city and Landsat scene
+so the batch scheduler can run it for any entry of a scene catalog.
+"""
+import os
+import numpy as np
+from pathlib import Path
+
+from config import (
+    IMAGES_DIR, POPULATION_DIR, ROADS_DIR, PROCESSED_DIR, PATCHES_DIR,
+    MODELS_DIR, PREDICTIONS_DIR, POP_YEARS, PATCH_SIZE,
+)
+
+MODEL_PATH = MODELS_DIR / "urban_growth_unet.h5"
+
+
+# ---------------------------
+# Paths
+# ---------------------------
+def band_path(scene_id, band, images_dir=IMAGES_DIR):
+    """Path of one Landsat band file, e.g. band_path(scene, "SR_B4")"""
+    return Path(images_dir) / f"{scene_id}_{band}.TIF"
+
+
+def scene_dirs(city, scene_id):
+    """Per-scene output folders under the configured data directories"""
+    dirs = {
+        "processed": PROCESSED_DIR / city / scene_id,
+        "patches": PATCHES_DIR / city / scene_id,
+        "predictions": PREDICTIONS_DIR / city / scene_id,
+    }
+    for d in dirs.values():
+        d.mkdir(parents=True, exist_ok=True)
+    return dirs
+
+
+def save_npz_atomic(path, **arrays):
+    """Write an .npz next to its final path and rename it into place"""
+    path = Path(path)
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+# ---------------------------
+# Features
+# ---------------------------
+def read_band(path):
+    """Read the first band of a raster as float32"""
+    import rasterio
+
+    with rasterio.open(path) as src:
+        return src.read(1).astype("float32")
+
+
+def reference_meta(scene_id, images_dir=IMAGES_DIR):
+    """Grid of the scene (SR_B3 is the reference raster, as in notebook 02)"""
+    import rasterio
+
+    with rasterio.open(band_path(scene_id, "SR_B3", images_dir)) as ref:
+        return ref.meta.copy()
+
+
+def resample_to_grid(src_path, meta):
+    """Bilinear reprojection of a raster onto the reference grid"""
+    import rasterio
+    from rasterio.warp import reproject, Resampling
+
+    dst = np.empty((meta["height"], meta["width"]), dtype="float32")
+    with rasterio.open(src_path) as src:
+        reproject(
+            source=src.read(1),
+            destination=dst,
+            src_transform=src.transform,
+            src_crs=src.crs,
+            dst_transform=meta["transform"],
+            dst_crs=meta["crs"],
+            resampling=Resampling.bilinear
+        )
+    return dst
+
+
+def population_path(year, pop_dir=POPULATION_DIR):
+    """WorldPop density raster of one year (notebook 02 naming)"""
+    return Path(pop_dir) / f"ind_pd_{year}_1km_UNadj.tif"
+
+
+def population_stack(meta, years=POP_YEARS, pop_dir=POPULATION_DIR):
+    """Population density for each year resampled onto the scene grid (H, W, Y)"""
+    layers = [resample_to_grid(population_path(year, pop_dir), meta) for year in years]
+    return np.stack(layers, axis=-1)
+
+
+def roads_path(city, roads_dir=ROADS_DIR):
+    """Road shapefile for a city (notebook 03 naming)"""
+    return Path(roads_dir) / f"{city.lower()}_roads.shp"
+
+
+def rasterize_roads(city, meta, roads_dir=ROADS_DIR):
+    """Rasterize the city road network onto the scene grid (uint8 mask)"""
+    import geopandas as gpd
+    from rasterio import features
+
+    roads = gpd.read_file(roads_path(city, roads_dir)).to_crs(meta["crs"])
+    return features.rasterize(
+        shapes=((geom, 1) for geom in roads.geometry),
+        out_shape=(meta["height"], meta["width"]),
+        transform=meta["transform"],
+        fill=0,
+        dtype="uint8"
+    )
+
+
+def distance_to_road(roads_raster, pixel_size):
+    """Euclidean distance (map units) from every pixel to the nearest road pixel"""
+    from scipy.ndimage import distance_transform_edt
+
+    return (distance_transform_edt(roads_raster == 0) * pixel_size).astype("float32")
+
+
+def compute_ndvi(scene_id, images_dir=IMAGES_DIR):
+    """NDVI from SR_B4 (red) and SR_B5 (NIR), as in notebook 04"""
+    red = read_band(band_path(scene_id, "SR_B4", images_dir))
+    nir = read_band(band_path(scene_id, "SR_B5", images_dir))
+    return (nir - red) / (nir + red + 1e-6)
+
+
+def build_features(city, scene_id, images_dir=IMAGES_DIR, usable=None, road_network=False):
+    """7-band feature stack: population (5 years), distance to road, NDVI
+
+    If a usable-pixel mask (qa_mask.usable_mask) is given, NDVI of cloudy,
+    shadowed and fill pixels is NaN (missing) instead of being computed
+    from them; the feature store keeps the mask next to the codes.
+    With road_network=True the cached road centrality layers
+    (road_network.NETWORK_BAND_NAMES) are appended as three extra bands;
+    only models trained on that 10-band stack can score the result.
+    """
+    meta = reference_meta(scene_id, images_dir)
+    pop = population_stack(meta)
+    dist = distance_to_road(rasterize_roads(city, meta), abs(meta["transform"].a))
+    ndvi = compute_ndvi(scene_id, images_dir)
+    if usable is not None:
+        ndvi = np.where(usable, ndvi, np.nan).astype("float32")
+    layers = [pop, dist, ndvi]
+    if road_network:
+        from road_network import network_layers
+
+        layers.append(network_layers(city, meta))
+    return np.dstack(layers).astype("float32")
+
+
+# ---------------------------
+# Patches
+# ---------------------------
+def create_patches(features, patch_size=PATCH_SIZE, tile_index=None):
+    """Create patches from (H, W, Bands) raster.
+
+    tile_index (row-major tile numbers) restricts extraction to those tiles,
+    e.g. the ones qa_mask.valid_tile_index keeps.
+    """
+    H, W, B = features.shape
+    cols = W // patch_size
+    if tile_index is None:
+        tile_index = range((H // patch_size) * cols)
+
+    patches = []
+    for k in tile_index:
+        i, j = (k // cols) * patch_size, (k % cols) * patch_size
+        patches.append(features[i:i+patch_size, j:j+patch_size, :])
+    return np.array(patches).reshape(-1, patch_size, patch_size, B)
+
+
+def normalize_patches(patches):
+    """Normalize each patch per band."""
+    patches = patches.astype("float32")
+    if patches.shape[0] == 0:
+        return patches
+    for b in range(patches.shape[-1]):
+        band = patches[..., b]
+        min_val, max_val = band.min(), band.max()
+        patches[..., b] = (band - min_val) / (max_val - min_val + 1e-6)
+    return patches
+
+
+# ---------------------------
+# Inference
+# ---------------------------
+_MODELS = {}
+
+
+def load_unet(model_path=MODEL_PATH):
+    """Load (and cache per process) the trained U-Net"""
+    model_path = str(model_path)
+    if model_path not in _MODELS:
+        import tensorflow as tf
+
+        _MODELS[model_path] = tf.keras.models.load_model(
+            model_path,
+            custom_objects={"mse": tf.keras.losses.MeanSquaredError()}
+        )
+    return _MODELS[model_path]
+
+
+def run_inference(patches, model_path=MODEL_PATH, batch_size=32):
+    """Urban probability maps (N, H, W, 1) for a patch array"""
+    if len(patches) == 0:
+        return np.zeros(patches.shape[:3] + (1,), dtype="float32")
+    model = load_unet(model_path)
+    return model.predict(patches, batch_size=batch_size, verbose=0)
+
+
+def run_inference_quantized(codes, scale, offset, model_path=MODEL_PATH, batch_size=32):
+    """run_inference on uint16 patch codes, dequantizing one batch at a time"""
+    from feature_store import iter_dequantized
+
+    if len(codes) == 0:
+        return np.zeros(codes.shape[:3] + (1,), dtype="float32")
+    model = load_unet(model_path)
+    return np.concatenate([
+        np.asarray(model.predict_on_batch(batch))
+        for batch in iter_dequantized(codes, scale, offset, batch_size)
+    ])
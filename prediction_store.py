@@ -0,0 +1,155 @@
+"""
+Compact storage for prediction sets.
+
+Masks (ground truth and thresholded predictions) are bit-packed, 8 pixels
+per byte, and probabilities are quantized to uint8 with a recorded scale.
+Metrics are computed directly on the packed bits with popcounts.
+
+Usage:
+    python prediction_store.py            # convert test_predictions.npz
+"""
+import numpy as np
+
+from config import PREDICTIONS_DIR
+
+THRESHOLD = 0.5
+PROB_SCALE = 255
+
+DENSE_PREDICTIONS_PATH = PREDICTIONS_DIR / "test_predictions.npz"
+PACKED_PREDICTIONS_PATH = PREDICTIONS_DIR / "test_predictions_packed.npz"
+
+
+def packed_predictions_path(model_name):
+    """Packed test-split predictions of one registered model"""
+    return PREDICTIONS_DIR / f"test_predictions_{model_name}_packed.npz"
+
+# Bit counts for every byte value (fallback when np.bitwise_count is missing)
+_POPCOUNT_TABLE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+# ---------------------------
+# Packing / Quantization
+# ---------------------------
+def pack_masks(masks, threshold=THRESHOLD):
+    """Bit-pack (N, H, W[, 1]) masks into (N, ceil(H*W/8)) uint8 rows"""
+    masks = np.asarray(masks)
+    n = masks.shape[0]
+    # Explicit row length: reshape(n, -1) is ambiguous for an empty set
+    bits = masks.reshape(n, int(np.prod(masks.shape[1:]))) > threshold
+    return np.packbits(bits, axis=1)
+
+
+def unpack_masks(packed, sample_shape):
+    """Unpack bit rows back into (N, *sample_shape) uint8 masks"""
+    n_pixels = int(np.prod(sample_shape))
+    bits = np.unpackbits(packed, axis=1, count=n_pixels)
+    return bits.reshape((packed.shape[0],) + tuple(sample_shape))
+
+
+def quantize_probabilities(probs, scale=PROB_SCALE):
+    """Quantize [0, 1] probabilities to uint8"""
+    probs = np.clip(np.asarray(probs, dtype="float32"), 0.0, 1.0)
+    return np.rint(probs * scale).astype(np.uint8)
+
+
+def dequantize_probabilities(quantized, scale=PROB_SCALE):
+    """Convert uint8 probabilities back to float32 in [0, 1]"""
+    return quantized.astype("float32") / scale
+
+
+def popcount(packed):
+    """Count set bits in a uint8 array"""
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(packed).sum(dtype=np.int64))
+    return int(_POPCOUNT_TABLE[packed].sum(dtype=np.int64))
+
+
+# ---------------------------
+# Store I/O
+# ---------------------------
+def build_store(predictions, ground_truth, threshold=THRESHOLD, scale=PROB_SCALE):
+    """Build a packed store dict from dense (N, H, W, 1) arrays"""
+    predictions = np.asarray(predictions)
+    return {
+        "sample_shape": np.array(predictions.shape[1:], dtype=np.int64),
+        "gt_bits": pack_masks(ground_truth, threshold),
+        "pred_bits": pack_masks(predictions, threshold),
+        "pred_q": quantize_probabilities(predictions, scale),
+        "scale": np.array(scale, dtype=np.int64),
+        "threshold": np.array(threshold, dtype="float32"),
+    }
+
+
+def save_store(path, store):
+    """Write a packed store to .npz"""
+    np.savez(path, **store)
+
+
+def load_store(path):
+    """Load a packed store from .npz"""
+    with np.load(path) as data:
+        store = {k: data[k] for k in data.files}
+    store["sample_shape"] = tuple(int(s) for s in store["sample_shape"])
+    store["scale"] = int(store["scale"])
+    store["threshold"] = float(store["threshold"])
+    return store
+
+
+def convert_dense_predictions(src=DENSE_PREDICTIONS_PATH, dst=PACKED_PREDICTIONS_PATH):
+    """Convert a dense predictions/ground_truth .npz into the packed format"""
+    with np.load(src) as data:
+        store = build_store(data["predictions"], data["ground_truth"])
+    save_store(dst, store)
+    return load_store(dst)
+
+
+# ---------------------------
+# Metrics
+# ---------------------------
+def confusion_counts(gt_bits, pred_bits, n_pixels):
+    """Return (tp, fp, fn, tn) from packed masks using popcounts"""
+    tp = popcount(gt_bits & pred_bits)
+    fp = popcount(pred_bits & ~gt_bits)
+    fn = popcount(gt_bits & ~pred_bits)
+    # Padding bits are zero in both masks, so they never reach tp/fp/fn
+    tn = n_pixels - tp - fp - fn
+    return tp, fp, fn, tn
+
+
+def metrics_from_counts(tp, fp, fn, tn):
+    """Accuracy / precision / recall / F1 / IoU from confusion counts"""
+    total = tp + fp + fn + tn
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "accuracy": (tp + tn) / total if total else 0.0,
+        "precision": precision,
+        "recall": recall,
+        "f1_score": 2 * tp / (2 * tp + fp + fn) if tp + fp + fn else 0.0,
+        "iou": tp / (tp + fp + fn) if tp + fp + fn else 0.0,
+    }
+
+
+def store_metrics(store):
+    """Metrics over every sample in a packed store"""
+    n_samples = store["gt_bits"].shape[0]
+    n_pixels = n_samples * int(np.prod(store["sample_shape"]))
+    counts = confusion_counts(store["gt_bits"], store["pred_bits"], n_pixels)
+    return metrics_from_counts(*counts)
+
+
+def sample_maps(store, index):
+    """Ground truth, probability and difference maps for one sample (H, W)"""
+    shape = store["sample_shape"]
+    gt = unpack_masks(store["gt_bits"][index:index + 1], shape)[0].astype("float32")
+    pred = dequantize_probabilities(store["pred_q"][index], store["scale"])
+    return {
+        "ground_truth": gt[..., 0],
+        "prediction": pred[..., 0],
+        "difference": np.abs(gt - pred)[..., 0],
+    }
+
+
+if __name__ == "__main__":
+    store = convert_dense_predictions()
+    print(f"✅ Packed {store['gt_bits'].shape[0]} samples into: {PACKED_PREDICTIONS_PATH}")
@@ -0,0 +1,92 @@
+"""
+Landsat Collection 2 QA masking.
+
+Decodes QA_PIXEL (fill / cloud / cirrus / shadow / snow bits) and
+SR_QA_AEROSOL (fill / high aerosol) into a usable-pixel mask, block by
+block, and computes the valid fraction of every patch tile so unusable
+tiles can be skipped before feature building, patching and inference.
+"""
+import numpy as np
+
+from config import IMAGES_DIR, PATCH_SIZE
+
+# QA_PIXEL bit positions (Landsat 8-9 Collection 2 Level-2)
+QA_FILL = 0
+QA_DILATED_CLOUD = 1
+QA_CIRRUS = 2
+QA_CLOUD = 3
+QA_CLOUD_SHADOW = 4
+QA_SNOW = 5
+
+# Any of these set -> pixel is unusable
+UNUSABLE_QA_BITS = (QA_FILL, QA_DILATED_CLOUD, QA_CIRRUS, QA_CLOUD, QA_CLOUD_SHADOW, QA_SNOW)
+
+# SR_QA_AEROSOL: bit 0 fill, bits 6-7 aerosol level (3 = high)
+AEROSOL_FILL = 0
+AEROSOL_LEVEL_SHIFT = 6
+AEROSOL_HIGH = 3
+
+BLOCK_SIZE = 1024
+
+
+def bits_mask(bits):
+    """Integer with the given bit positions set"""
+    mask = 0
+    for b in bits:
+        mask |= 1 << b
+    return mask
+
+
+def decode_qa_pixel(qa, unusable_bits=UNUSABLE_QA_BITS):
+    """Usable-pixel mask (bool) from a QA_PIXEL array"""
+    return (qa.astype(np.uint16) & bits_mask(unusable_bits)) == 0
+
+
+def decode_aerosol(aerosol, drop_high=True):
+    """Usable-pixel mask (bool) from an SR_QA_AEROSOL array"""
+    aerosol = aerosol.astype(np.uint8)
+    usable = (aerosol & (1 << AEROSOL_FILL)) == 0
+    if drop_high:
+        usable &= (aerosol >> AEROSOL_LEVEL_SHIFT) != AEROSOL_HIGH
+    return usable
+
+
+def usable_mask(scene_id, images_dir=IMAGES_DIR, use_aerosol=True, block_size=BLOCK_SIZE):
+    """Usable-pixel mask for a whole scene, decoded one block window at a time"""
+    import rasterio
+    from rasterio.windows import Window
+    from pipeline import band_path
+
+    qa_src = rasterio.open(band_path(scene_id, "QA_PIXEL", images_dir))
+    aerosol_path = band_path(scene_id, "SR_QA_AEROSOL", images_dir)
+    aero_src = rasterio.open(aerosol_path) if use_aerosol and aerosol_path.exists() else None
+
+    try:
+        mask = np.zeros((qa_src.height, qa_src.width), dtype=bool)
+        for row in range(0, qa_src.height, block_size):
+            for col in range(0, qa_src.width, block_size):
+                window = Window(col, row,
+                                min(block_size, qa_src.width - col),
+                                min(block_size, qa_src.height - row))
+                block = decode_qa_pixel(qa_src.read(1, window=window))
+                if aero_src is not None:
+                    block &= decode_aerosol(aero_src.read(1, window=window))
+                mask[row:row + window.height, col:col + window.width] = block
+    finally:
+        qa_src.close()
+        if aero_src is not None:
+            aero_src.close()
+    return mask
+
+
+def tile_valid_fraction(mask, patch_size=PATCH_SIZE):
+    """Fraction of usable pixels in each tile, in create_patches order"""
+    H, W = mask.shape[:2]
+    rows, cols = H // patch_size, W // patch_size
+    tiles = mask[:rows * patch_size, :cols * patch_size].reshape(rows, patch_size, cols, patch_size)
+    return tiles.mean(axis=(1, 3), dtype="float32").reshape(-1)
+
+
+def valid_tile_index(valid_fraction, min_valid_fraction):
+    """Indices of tiles with enough usable pixels"""
+    return np.flatnonzero(valid_fraction >= min_valid_fraction)
@@ -0,0 +1,195 @@
+"""
+Batch report and chart export.
+
+Renders, for one prediction set, a comparison panel per sample (ground
+truth / prediction / difference) into MAPS_DIR and the metric summary,
+PR curve and growth trend charts into CHARTS_DIR. Sample panels are drawn
+in a process pool with the non-interactive Agg backend, then collected
+into a multi-page PDF report next to a JSON manifest.
+
+Usage:
+    python report_export.py --model unet_student --workers 4
+    python report_export.py --predictions data/predictions/test_predictions_packed.npz
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+from config import MAPS_DIR, CHARTS_DIR, GROWTH_TREND_YEARS, GROWTH_TREND
+from model_registry import DEFAULT_MODEL
+from prediction_store import packed_predictions_path, load_store, store_metrics, sample_maps
+from threshold_sweep import sweep_store, pr_curve, best_threshold
+
+SAMPLES_PER_PAGE = 4
+CHUNK_SAMPLES = 32
+
+_store = None
+
+
+def _init_worker(store_path):
+    """Load the prediction store once per worker process"""
+    global _store
+    matplotlib.use("Agg")
+    _store = load_store(store_path)
+
+
+def draw_sample_panel(axes, maps, index):
+    axes[0].imshow(maps["ground_truth"], cmap='viridis')
+    axes[0].set_title(f"Ground Truth #{index}")
+    axes[1].imshow(maps["prediction"], cmap='plasma', vmin=0, vmax=1)
+    axes[1].set_title("Model Prediction")
+    axes[2].imshow(maps["difference"], cmap='coolwarm', vmin=0, vmax=1)
+    axes[2].set_title("Difference Map")
+    for ax in axes:
+        ax.axis('off')
+
+
+def _render_samples(indices, out_dir):
+    """Render comparison PNGs for a chunk of samples (runs in a worker)"""
+    files = []
+    for index in indices:
+        fig, axes = plt.subplots(1, 3, figsize=(12, 4))
+        draw_sample_panel(axes, sample_maps(_store, index), index)
+        fig.tight_layout()
+        path = Path(out_dir) / f"sample_{index:05d}.png"
+        fig.savefig(path, dpi=100)
+        plt.close(fig)
+        files.append((index, str(path)))
+    return files
+
+
+def render_metric_summary(metrics, path):
+    fig, ax = plt.subplots(figsize=(8, 4))
+    names = ["accuracy", "precision", "recall", "f1_score", "iou"]
+    bars = ax.bar([n.replace("_", " ").title() for n in names], [metrics[n] for n in names], color='#2563eb')
+    ax.bar_label(bars, fmt="%.4f")
+    ax.set_ylim(0, 1.05)
+    ax.set_title("Model Performance Metrics (threshold 0.5)", fontweight='bold')
+    ax.grid(True, axis='y', alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(path, dpi=100)
+    return fig
+
+
+def render_pr_curve(curves, path):
+    recall, precision = pr_curve(curves)
+    best_t, best_f1 = best_threshold(curves)
+    fig, ax = plt.subplots(figsize=(6, 5))
+    ax.plot(recall, precision, linewidth=2, color='#2563eb')
+    ax.set_xlabel("Recall")
+    ax.set_ylabel("Precision")
+    ax.set_title(f"Precision-Recall Curve (best F1 {best_f1:.4f} @ {best_t:.2f})", fontweight='bold')
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1.05)
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(path, dpi=100)
+    return fig
+
+
+def render_trend(path, years=GROWTH_TREND_YEARS, growth=GROWTH_TREND):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.plot(years, growth, marker="o", linewidth=2.5, markersize=8, color='#2563eb')
+    ax.fill_between(years, growth, alpha=0.3, color='#2563eb')
+    ax.set_xlabel("Year", fontsize=12, fontweight='bold')
+    ax.set_ylabel("Urban Growth (%)", fontsize=12, fontweight='bold')
+    ax.set_title("Predicted Urban Growth Trend (2000-2040)", fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(path, dpi=100)
+    return fig
+
+
+def add_sample_pages(pdf, sample_files):
+    """Lay the rendered sample PNGs out SAMPLES_PER_PAGE to a PDF page"""
+    for start in range(0, len(sample_files), SAMPLES_PER_PAGE):
+        page = sample_files[start:start + SAMPLES_PER_PAGE]
+        fig, axes = plt.subplots(SAMPLES_PER_PAGE, 1, figsize=(8.27, 11.69))
+        for ax in axes:
+            ax.axis('off')
+        for ax, (_, path) in zip(axes, page):
+            ax.imshow(plt.imread(path))
+        fig.tight_layout()
+        pdf.savefig(fig)
+        plt.close(fig)
+
+
+def export_report(store_path=None, name=None, workers=4, limit=None):
+    """Render every chart for a prediction set and write PDF + manifest"""
+    store_path = Path(store_path or packed_predictions_path(DEFAULT_MODEL))
+    name = name or store_path.stem
+    maps_dir = MAPS_DIR / name
+    charts_dir = CHARTS_DIR / name
+    maps_dir.mkdir(parents=True, exist_ok=True)
+    charts_dir.mkdir(parents=True, exist_ok=True)
+
+    store = load_store(store_path)
+    n_samples = store["pred_q"].shape[0]
+    indices = list(range(n_samples if limit is None else min(limit, n_samples)))
+    chunks = [indices[i:i + CHUNK_SAMPLES] for i in range(0, len(indices), CHUNK_SAMPLES)]
+
+    start = time.perf_counter()
+    sample_files = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(str(store_path),)) as pool:
+        for files in pool.map(_render_samples, chunks, [str(maps_dir)] * len(chunks)):
+            sample_files.extend(files)
+    print(f"✅ Rendered {len(sample_files)} sample panels in {time.perf_counter() - start:.1f}s")
+
+    metrics = store_metrics(store)
+    curves = sweep_store(store)
+    charts = {
+        "metrics": charts_dir / "metrics_summary.png",
+        "pr_curve": charts_dir / "pr_curve.png",
+        "trend": charts_dir / "growth_trend.png",
+    }
+    pdf_path = charts_dir / f"{name}_report.pdf"
+    with PdfPages(pdf_path) as pdf:
+        for fig in (render_metric_summary(metrics, charts["metrics"]),
+                    render_pr_curve(curves, charts["pr_curve"]),
+                    render_trend(charts["trend"])):
+            pdf.savefig(fig)
+            plt.close(fig)
+        add_sample_pages(pdf, sample_files)
+
+    manifest = {
+        "name": name,
+        "source": str(store_path),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "n_samples": len(sample_files),
+        "metrics": metrics,
+        "charts": {k: str(v) for k, v in charts.items()},
+        "report_pdf": str(pdf_path),
+        "samples": [{"index": i, "png": p} for i, p in sample_files],
+    }
+    manifest_path = charts_dir / "manifest.json"
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Report written: {pdf_path}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export prediction comparison charts and a PDF report")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Registered model whose test predictions to export")
+    parser.add_argument("--predictions", help="Packed prediction store (.npz); overrides --model")
+    parser.add_argument("--name", help="Output folder name (default: store file name)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--limit", type=int, help="Only export the first N samples")
+    args = parser.parse_args()
+
+    store_path = Path(args.predictions or packed_predictions_path(args.model))
+    if not store_path.exists():
+        print(f"❌ Prediction store not found: {store_path} (run test_predictions.py --model {args.model})")
+        return
+    export_report(store_path, args.name, args.workers, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Road-network centrality feature layers.
+
+Notebook 03 flattens the OSMnx drive network behind pune_roads into a
+shapefile, so only distance-to-road reaches the feature stack. This module
+rebuilds the road graph from it once (nodes = snapped segment end points,
+edges weighted by length) and derives three layers:
+
+    road_betweenness       betweenness approximated from k sampled sources
+    road_closeness         closeness approximated from the same sources
+    intersection_density   junctions (degree >= 3) per km² around each pixel
+
+The sampled sources are split into chunks that worker processes score in
+parallel. Node metrics are rasterized onto the feature grid in row blocks
+(each pixel takes the value of its nearest road node). The graph, the node
+metrics and the rasterized layers are cached under
+data/processed/road_network/<city>, keyed by the graph hash, so pipeline
+runs only pay for them when the roads change.
+
+Usage:
+    python road_network.py                       # layers for the configured scene
+    python road_network.py --samples 1000 --workers 8
+"""
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from config import PROCESSED_DIR, ROADS_DIR, CITY, SCENE_ID
+
+NETWORK_CACHE_DIR = PROCESSED_DIR / "road_network"
+NETWORK_BAND_NAMES = ["road_betweenness", "road_closeness", "intersection_density"]
+
+DEFAULT_SAMPLES = 500        # sampled sources for betweenness / closeness
+SEED = 42
+SNAP = 0.5                   # end points closer than this (map units) are one node
+DENSITY_RADIUS = 500         # half-width of the intersection density window (map units)
+BLOCK_ROWS = 512
+METRICS_VERSION = 2          # bump when an estimator changes, invalidates cached metrics
+
+
+def cache_dir(city):
+    path = NETWORK_CACHE_DIR / city.lower()
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def short_hash(*parts):
+    """16-hex-digit SHA-256 over strings / arrays"""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.tobytes() if isinstance(part, np.ndarray) else str(part).encode())
+    return h.hexdigest()[:16]
+
+
+def grid_key(meta):
+    """Identity of a raster grid (CRS, transform, shape)"""
+    return short_hash(str(meta["crs"]), [round(float(v), 6) for v in tuple(meta["transform"])[:6]],
+                      meta["height"], meta["width"])
+
+
+# ---------------------------
+# Graph
+# ---------------------------
+def segment_endpoints(city, crs, roads_dir=ROADS_DIR):
+    """Start / end coordinates and lengths of every road segment, in the grid CRS"""
+    import geopandas as gpd
+    import shapely
+    from pipeline import roads_path
+
+    roads = gpd.read_file(roads_path(city, roads_dir)).to_crs(crs)
+    lines = roads.geometry.explode(index_parts=False)
+    lines = lines[lines.geom_type == "LineString"].values
+    start = shapely.get_coordinates(shapely.get_point(lines, 0))
+    end = shapely.get_coordinates(shapely.get_point(lines, -1))
+    return start, end, np.asarray(shapely.length(lines), dtype="float64")
+
+
+def build_graph(start, end, length, snap=SNAP):
+    """Undirected road graph as arrays: node_xy, u, v, length
+
+    End points are snapped to a snap-sized grid to join segments;
+    self-loops are dropped and parallel edges keep the shortest length.
+    """
+    keys = np.rint(np.concatenate([start, end]) / snap).astype(np.int64)
+    node_keys, node_of = np.unique(keys, axis=0, return_inverse=True)
+    node_of = node_of.reshape(-1)
+    u, v = node_of[:len(start)], node_of[len(start):]
+
+    keep = u != v
+    u, v, length = np.minimum(u, v)[keep], np.maximum(u, v)[keep], length[keep]
+    order = np.argsort(length, kind="stable")
+    _, first = np.unique(np.stack([u[order], v[order]], axis=1), axis=0, return_index=True)
+    pick = np.sort(order[first])
+    return {
+        "node_xy": node_keys.astype("float64") * snap,
+        "u": u[pick],
+        "v": v[pick],
+        "length": length[pick],
+    }
+
+
+def graph_hash(graph):
+    return short_hash(graph["node_xy"], graph["u"], graph["v"], np.round(graph["length"], 3))
+
+
+def load_road_graph(city, crs, roads_dir=ROADS_DIR, snap=SNAP):
+    """Road graph for a city, built from the shapefile once and then cached
+
+    The cache is reused while the shapefile's size / mtime and the CRS match.
+    """
+    from pipeline import roads_path, save_npz_atomic
+
+    stat = os.stat(roads_path(city, roads_dir))
+    source = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "crs": str(crs), "snap": snap}
+    path = cache_dir(city) / "graph.npz"
+    if path.exists():
+        with np.load(path) as data:
+            if json.loads(str(data["source"])) == source:
+                graph = {k: data[k] for k in ("node_xy", "u", "v", "length")}
+                graph["hash"] = str(data["hash"])
+                return graph
+
+    graph = build_graph(*segment_endpoints(city, crs, roads_dir), snap=snap)
+    graph["hash"] = graph_hash(graph)
+    save_npz_atomic(path, source=json.dumps(source), **graph)
+    print(f"✅ Road graph for {city}: {len(graph['node_xy'])} nodes, {len(graph['u'])} edges")
+    return graph
+
+
+def to_networkx(graph):
+    import networkx as nx
+
+    G = nx.Graph()
+    G.add_nodes_from(range(len(graph["node_xy"])))
+    G.add_weighted_edges_from(zip(graph["u"].tolist(), graph["v"].tolist(), graph["length"].tolist()),
+                              weight="length")
+    return G
+
+
+def to_adjacency(graph):
+    """CSR adjacency (indptr, neighbours, lengths) of the undirected graph, as lists"""
+    n = len(graph["node_xy"])
+    a = np.concatenate([graph["u"], graph["v"]])
+    b = np.concatenate([graph["v"], graph["u"]])
+    w = np.concatenate([graph["length"], graph["length"]])
+    order = np.argsort(a, kind="stable")
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(a, minlength=n))])
+    return indptr.tolist(), b[order].tolist(), w[order].tolist()
+
+
+def node_degree(graph):
+    n = len(graph["node_xy"])
+    return np.bincount(graph["u"], minlength=n) + np.bincount(graph["v"], minlength=n)
+
+
+# ---------------------------
+# Centrality (sampled, parallel)
+# ---------------------------
+_ADJ = None
+
+
+def _init_worker(graph):
+    global _ADJ
+    _ADJ = to_adjacency(graph)
+
+
+def shortest_paths(adjacency, s):
+    """Dijkstra from s with shortest-path counts (Brandes)
+
+    Returns the nodes in order of distance, their predecessors on shortest
+    paths, the number of shortest paths (sigma) and the distances.
+    Equal-length paths are detected by exact float equality, as networkx
+    does, so the sums match its values.
+    """
+    indptr, neighbours, lengths = adjacency
+    order, pred, sigma, dist = [], {s: []}, {s: 1.0}, {}
+    seen = {s: 0.0}
+    counter = itertools.count()
+    queue = [(0.0, next(counter), s, s)]
+    while queue:
+        d, _, p, v = heapq.heappop(queue)
+        if v in dist:
+            continue
+        sigma[v] += sigma[p] if p != v else 0.0
+        order.append(v)
+        dist[v] = d
+        for i in range(indptr[v], indptr[v + 1]):
+            w, vw = neighbours[i], d + lengths[i]
+            if w not in dist and (w not in seen or vw < seen[w]):
+                seen[w] = vw
+                heapq.heappush(queue, (vw, next(counter), v, w))
+                sigma[w] = 0.0
+                pred[w] = [v]
+            elif vw == seen[w]:
+                sigma[w] += sigma[v]
+                pred[w].append(v)
+    return order, pred, sigma, dist
+
+
+def _score_sources(sources):
+    """Partial sums for a chunk of sources: betweenness, distance sum, reach count
+
+    One shortest-path search per source feeds all three: the Brandes
+    dependencies (ordered pairs, unnormalized) and the distances.
+    """
+    n = len(_ADJ[0]) - 1
+    betweenness = np.zeros(n)
+    dist_sum = np.zeros(n)
+    reach = np.zeros(n)
+    for s in (int(s) for s in sources):
+        order, pred, sigma, dist = shortest_paths(_ADJ, s)
+        delta = dict.fromkeys(order, 0.0)
+        for w in reversed(order):
+            coeff = (1.0 + delta[w]) / sigma[w]
+            for v in pred[w]:
+                delta[v] += sigma[v] * coeff
+            if w != s:
+                betweenness[w] += delta[w]
+        nodes = np.fromiter(dist.keys(), dtype=np.int64, count=len(dist))
+        dist_sum[nodes] += np.fromiter(dist.values(), dtype="float64", count=len(dist))
+        reach[nodes] += 1
+        reach[s] -= 1               # a source does not count towards its own closeness
+    return betweenness, dist_sum, reach
+
+
+def network_centrality(graph, samples=DEFAULT_SAMPLES, workers=None, seed=SEED):
+    """Approximate node betweenness and closeness from sampled sources
+
+    betweenness: Brandes accumulation over k random sources scaled by n/k,
+    normalized like networkx (0-1). closeness: inverse mean network distance
+    to the sources, scaled by the share of the other sources that reach the
+    node (Wasserman-Faust), so disconnected fragments score low. With k = n
+    both equal networkx's exact values.
+    """
+    n = len(graph["node_xy"])
+    k = min(samples, n)
+    sources = np.random.default_rng(seed).choice(n, size=k, replace=False)
+    workers = workers or os.cpu_count() or 1
+    chunks = [c for c in np.array_split(sources, workers * 4) if len(c)]
+
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(graph)
+        parts = [_score_sources(c) for c in chunks]
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(graph,)) as pool:
+            parts = list(pool.map(_score_sources, chunks))
+    betweenness, dist_sum, reach = (np.sum(p, axis=0) for p in zip(*parts))
+
+    if n > 2:
+        # Ordered-pair dependencies, so no factor 2 for the undirected graph
+        betweenness = betweenness * (n / k) / ((n - 1) * (n - 2))
+    # Wasserman-Faust over the sampled sources other than the node itself
+    others = np.full(n, k, dtype="float64")
+    others[sources] -= 1
+    closeness = np.divide(reach * reach, others * dist_sum, out=np.zeros(n), where=dist_sum > 0)
+    print(f"✅ Centrality from {k} sampled sources on {n} nodes in {time.perf_counter() - start:.1f}s")
+    return betweenness.astype("float32"), closeness.astype("float32")
+
+
+def node_metrics(city, graph, samples=DEFAULT_SAMPLES, workers=None, seed=SEED):
+    """network_centrality, cached by graph hash and sampling parameters"""
+    from pipeline import save_npz_atomic
+
+    path = cache_dir(city) / f"centrality_v{METRICS_VERSION}_{graph['hash']}_{samples}_{seed}.npz"
+    if path.exists():
+        with np.load(path) as data:
+            return data["betweenness"], data["closeness"]
+    betweenness, closeness = network_centrality(graph, samples, workers, seed)
+    save_npz_atomic(path, betweenness=betweenness, closeness=closeness)
+    return betweenness, closeness
+
+
+# ---------------------------
+# Rasterization
+# ---------------------------
+def pixel_centers(meta, row0, row1):
+    """Map coordinates (N, 2) of the pixel centres in rows row0:row1"""
+    a, b, c, d, e, f = tuple(meta["transform"])[:6]
+    rows, cols = np.mgrid[row0:row1, 0:meta["width"]] + 0.5
+    return np.column_stack([(a * cols + b * rows + c).ravel(), (d * cols + e * rows + f).ravel()])
+
+
+def rasterize_nearest(node_xy, values, meta, block_rows=BLOCK_ROWS):
+    """(H, W, M) grid where every pixel takes the values (N, M) of its nearest node"""
+    from scipy.spatial import cKDTree
+
+    tree = cKDTree(node_xy)
+    H, W = meta["height"], meta["width"]
+    out = np.empty((H, W, values.shape[1]), dtype="float32")
+    for row0 in range(0, H, block_rows):
+        row1 = min(row0 + block_rows, H)
+        _, nearest = tree.query(pixel_centers(meta, row0, row1), workers=-1)
+        out[row0:row1] = values[nearest].reshape(row1 - row0, W, -1)
+    return out
+
+
+def intersection_density(junction_xy, meta, radius=DENSITY_RADIUS, block_rows=BLOCK_ROWS):
+    """Junctions per km² in a (2 * radius) square window around each pixel"""
+    from scipy.ndimage import uniform_filter
+
+    H, W = meta["height"], meta["width"]
+    a, b, c, d, e, f = tuple(meta["transform"])[:6]
+    inverse = np.linalg.inv(np.array([[a, b], [d, e]]))
+    colrow = np.floor(inverse @ (junction_xy.T - np.array([[c], [f]]))).astype(np.int64)
+    inside = (colrow[0] >= 0) & (colrow[0] < W) & (colrow[1] >= 0) & (colrow[1] < H)
+    counts = np.zeros((H, W), dtype="float32")
+    np.add.at(counts, (colrow[1][inside], colrow[0][inside]), 1)
+
+    pixel_area = abs(a * e - b * d)
+    halo = max(int(round(radius / np.sqrt(pixel_area))), 0)
+    size = 2 * halo + 1
+    density = np.empty((H, W), dtype="float32")
+    for row0 in range(0, H, block_rows):
+        row1 = min(row0 + block_rows, H)
+        lo, hi = max(row0 - halo, 0), min(row1 + halo, H)
+        window_mean = uniform_filter(counts[lo:hi], size=size, mode="constant")
+        # mean count per pixel -> count per km²
+        density[row0:row1] = window_mean[row0 - lo:row1 - lo] * 1e6 / pixel_area
+    return density
+
+
+def network_layers(city, meta, samples=DEFAULT_SAMPLES, workers=None, seed=SEED,
+                   radius=DENSITY_RADIUS, roads_dir=ROADS_DIR):
+    """(H, W, 3) float32 road_betweenness, road_closeness, intersection_density
+
+    Cached per graph hash, grid and parameters; a cache hit is a single
+    memory-mapped read.
+    """
+    graph = load_road_graph(city, meta["crs"], roads_dir)
+    key = short_hash(graph["hash"], grid_key(meta), samples, seed, radius, METRICS_VERSION)
+    path = cache_dir(city) / f"layers_{key}.npy"
+    if path.exists():
+        print(f"✅ Road network layers from cache: {path.name}")
+        return np.load(path, mmap_mode="r")
+
+    betweenness, closeness = node_metrics(city, graph, samples, workers, seed)
+    start = time.perf_counter()
+    layers = rasterize_nearest(graph["node_xy"], np.column_stack([betweenness, closeness]), meta)
+    junctions = graph["node_xy"][node_degree(graph) >= 3]
+    layers = np.dstack([layers, intersection_density(junctions, meta, radius)])
+
+    tmp = path.with_name(path.stem + ".tmp.npy")
+    np.save(tmp, layers)
+    os.replace(tmp, path)
+    print(f"✅ Rasterized road network layers in {time.perf_counter() - start:.1f}s → {path.name}")
+    return layers
+
+
+def main():
+    from pipeline import reference_meta
+
+    parser = argparse.ArgumentParser(description="Build cached road-network centrality layers")
+    parser.add_argument("--city", default=CITY)
+    parser.add_argument("--scene-id", default=SCENE_ID)
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--radius", type=float, default=DENSITY_RADIUS)
+    args = parser.parse_args()
+
+    meta = reference_meta(args.scene_id)
+    layers = network_layers(args.city, meta, args.samples, args.workers, args.seed, args.radius)
+    for name, band in zip(NETWORK_BAND_NAMES, np.moveaxis(layers, -1, 0)):
+        print(f"{name:<22} min {band.min():.4g}  mean {band.mean():.4g}  max {band.max():.4g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Index-based train/val/test splits over a patch store.
+
+A split scheme is just three index arrays saved under the store's
+splits/ folder, so new schemes are instant and nothing is copied.
+The "spatial" scheme assigns whole blocks of neighbouring tiles to one
+split (and can drop a buffer of training tiles bordering val/test), so
+adjacent, overlapping-context tiles do not leak between splits.
+
+With --road-network the patch store is cut from the feature stack plus
+the road centrality bands (10 bands, patch_store_network) for training a
+network-aware model.
+
+Usage:
+    python splits.py                      # build the default patch store + splits
+    python splits.py --scheme spatial --block-tiles 4 --buffer-tiles 1
+    python splits.py --road-network --rebuild
+"""
+import argparse
+import numpy as np
+
+from config import PATCH_SIZE, SCENE_ID, CITY, MIN_VALID_FRACTION
+from patch_store import PatchStore, patch_store_path, write_patch_store, percentile_labels
+
+TRAIN_RATIO = 0.7
+VAL_RATIO = 0.15
+TEST_RATIO = 0.15
+SEED = 42
+DEFAULT_SCHEME = "random"
+
+
+def random_split(n, ratios=(TRAIN_RATIO, VAL_RATIO, TEST_RATIO), seed=SEED):
+    """Shuffled index split (what the notebook's two train_test_split calls did)"""
+    index = np.random.default_rng(seed).permutation(n)
+    n_train = int(round(n * ratios[0]))
+    n_val = int(round(n * ratios[1]))
+    return {
+        "train": np.sort(index[:n_train]),
+        "val": np.sort(index[n_train:n_train + n_val]),
+        "test": np.sort(index[n_train + n_val:]),
+    }
+
+
+def spatial_block_split(manifest, block_tiles=4, buffer_tiles=0,
+                        ratios=(TRAIN_RATIO, VAL_RATIO, TEST_RATIO), seed=SEED):
+    """Split whole block_tiles x block_tiles groups of tiles per scene
+
+    With buffer_tiles > 0, training tiles within that many tiles of a
+    val/test tile are dropped.
+    """
+    P = manifest.patch_size
+    tile_row = manifest.row_off // P
+    tile_col = manifest.col_off // P
+    scene_codes = np.unique(manifest.scene_id, return_inverse=True)[1]
+
+    # One id per (scene, block row, block col)
+    block_keys = np.stack([scene_codes, tile_row // block_tiles, tile_col // block_tiles], axis=1)
+    blocks, block_of_patch = np.unique(block_keys, axis=0, return_inverse=True)
+    block_of_patch = block_of_patch.reshape(-1)
+
+    block_split = random_split(len(blocks), ratios, seed)
+    assignment = np.zeros(len(blocks), dtype=np.int8)       # 0 train, 1 val, 2 test
+    assignment[block_split["val"]] = 1
+    assignment[block_split["test"]] = 2
+    patch_split = assignment[block_of_patch]
+
+    keep = np.ones(len(manifest), dtype=bool)
+    if buffer_tiles > 0:
+        for code in np.unique(scene_codes):
+            rows = np.flatnonzero(scene_codes == code)
+            tr, tc = tile_row[rows], tile_col[rows]
+            held_out = np.zeros((tr.max() + 1, tc.max() + 1), dtype=bool)
+            held_out[tr[patch_split[rows] > 0], tc[patch_split[rows] > 0]] = True
+            # Dilate the held-out tiles by buffer_tiles (Chebyshev distance)
+            padded = np.pad(held_out, buffer_tiles)
+            near = np.zeros_like(held_out)
+            for dr in range(2 * buffer_tiles + 1):
+                for dc in range(2 * buffer_tiles + 1):
+                    near |= padded[dr:dr + held_out.shape[0], dc:dc + held_out.shape[1]]
+            keep[rows] = ~((patch_split[rows] == 0) & near[tr, tc])
+
+    return {
+        "train": np.flatnonzero((patch_split == 0) & keep),
+        "val": np.flatnonzero(patch_split == 1),
+        "test": np.flatnonzero(patch_split == 2),
+    }
+
+
+def make_split(store, scheme=DEFAULT_SCHEME, block_tiles=4, buffer_tiles=0, seed=SEED):
+    """Compute and save a split scheme for a patch store"""
+    if scheme == "random":
+        splits = random_split(len(store), seed=seed)
+        params = {"seed": seed}
+    elif scheme == "spatial":
+        splits = spatial_block_split(store.manifest, block_tiles, buffer_tiles, seed=seed)
+        params = {"seed": seed, "block_tiles": block_tiles, "buffer_tiles": buffer_tiles}
+    else:
+        raise ValueError(f"Unknown split scheme: {scheme}")
+    store.save_split(scheme, splits, **params)
+    print(f"✅ Split '{scheme}': " + ", ".join(f"{k} {len(v)}" for k, v in splits.items()))
+    return splits
+
+
+def scene_usable_mask(features):
+    """Usable-pixel mask for the configured scene (stored mask, else QA bands)"""
+    import qa_mask
+
+    if features.has_mask("usable"):
+        return features.mask("usable")
+    try:
+        return qa_mask.usable_mask(SCENE_ID)
+    except Exception as e:
+        print(f"⚠️ Could not read QA bands ({e}), keeping every tile")
+        return np.ones(features.shape[:2], dtype=bool)
+
+
+def build_default_store(path=None, min_valid_fraction=MIN_VALID_FRACTION, road_network=False):
+    """Patch store for the configured scene, cut from the feature store
+
+    Tiles with too few clear pixels (QA_PIXEL / aerosol) are skipped, as in
+    the batch scheduler; the valid fraction of the kept ones is stored for
+    down-weighting during training. road_network=True appends the road
+    centrality bands and writes to the network patch store by default.
+    """
+    import pipeline
+    import qa_mask
+    from feature_store import (
+        FeatureStore, FEATURE_STORE_PATH, convert_npz, normalized_encoding, add_network_bands,
+    )
+    from patch_manifest import PatchManifest
+
+    path = path or patch_store_path(road_network)
+    features = FeatureStore(FEATURE_STORE_PATH) if (FEATURE_STORE_PATH / "meta.json").exists() else convert_npz()
+    try:
+        meta = pipeline.reference_meta(SCENE_ID)
+    except Exception as e:
+        if road_network:
+            raise ValueError(f"Road network bands need the scene georeference: {e}") from e
+        # Without the reference band only pixel coordinates are known
+        print(f"⚠️ Could not read scene georeference ({e}), using pixel coordinates")
+        meta = {"transform": (1, 0, 0, 0, 1, 0), "crs": None,
+                "height": features.shape[0], "width": features.shape[1]}
+    if road_network:
+        features = add_network_bands(features, CITY, meta)
+
+    valid_fraction = qa_mask.tile_valid_fraction(scene_usable_mask(features), PATCH_SIZE)
+    tile_index = qa_mask.valid_tile_index(valid_fraction, min_valid_fraction)
+    print(f"Keeping {len(tile_index)}/{len(valid_fraction)} tiles after QA masking")
+    codes = features.tile_codes(tile_index)
+    scale, offset = normalized_encoding(codes)
+
+    manifest = PatchManifest.from_tiles(CITY, SCENE_ID, meta, tile_index, PATCH_SIZE)
+    return write_patch_store(path, codes, scale, offset, manifest, labels=percentile_labels(codes),
+                             valid_fraction=valid_fraction[tile_index], bands=features.bands)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build index-based splits over the patch store")
+    parser.add_argument("--scheme", choices=["random", "spatial"], default=DEFAULT_SCHEME)
+    parser.add_argument("--block-tiles", type=int, default=4)
+    parser.add_argument("--buffer-tiles", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the patch store first")
+    parser.add_argument("--road-network", action="store_true",
+                        help="Use the patch store with the road network bands (10 bands)")
+    args = parser.parse_args()
+
+    path = patch_store_path(args.road_network)
+    if args.rebuild or not (path / "meta.json").exists():
+        store = build_default_store(path, road_network=args.road_network)
+        print(f"✅ Patch store: {len(store)} patches at {store.path}")
+    else:
+        store = PatchStore(path)
+
+    make_split(store, args.scheme, args.block_tiles, args.buffer_tiles, args.seed)
+    if args.road_network:
+        print("Next: python unet.py --road-network --model unet_network  (train a 10-band model)")
+    else:
+        print("Next: python test_predictions.py  (test predictions + patch manifest for this split)")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,8 @@ import urllib.parse
 current_dir = os.path.dirname(__file__)
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
+# Project root (model_registry, prediction_store, ...) for the sidebar imports
+sys.path.append(os.path.dirname(parent_dir))
 
 from utils import get_token, decode_token, get_username
 
@@ -29,6 +31,8 @@ if 'model_loaded' not in st.session_state:
     st.session_state.model_loaded = False
 if 'predictor' not in st.session_state:
     st.session_state.predictor = None
+if 'model_name' not in st.session_state:
+    st.session_state.model_name = "unet"
 
 # Main Dashboard
 st.title("🌆 Urban Growth Prediction Dashboard")
@@ -51,6 +55,21 @@ with st.sidebar:
     with col2:
         st.metric("Accuracy", "89%", "1.2%")
     
+    # Model selection (full U-Net or distilled lightweight variant)
+    st.header("🤖 Model")
+    try:
+        from model_registry import model_names
+        available_models = model_names()
+    except Exception:
+        available_models = ["unet"]
+    model_name = st.selectbox("Prediction Model", available_models,
+                              index=available_models.index(st.session_state.model_name)
+                              if st.session_state.model_name in available_models else 0)
+    if model_name != st.session_state.model_name:
+        st.session_state.model_name = model_name
+        st.session_state.model_loaded = False
+        st.session_state.predictor = None
+    
     st.markdown("---")
     if st.button("🔄 Refresh Dashboard", use_container_width=True):
         st.session_state.model_loaded = False
@@ -62,7 +81,7 @@ if not st.session_state.model_loaded:
     with st.spinner("🚀 Loading Prediction Model and Data..."):
         try:
             from urban_predictor import UrbanGrowthPredictor
-            st.session_state.predictor = UrbanGrowthPredictor()
+            st.session_state.predictor = UrbanGrowthPredictor(st.session_state.model_name)
             st.session_state.model_loaded = True
             st.success("✅ Prediction Model loaded successfully!")
         except Exception as e:
@@ -148,6 +167,10 @@ if st.session_state.model_loaded:
             plt.close(fig)
         
     else:
+        if predictor.data_source == "dummy":
+            st.warning(f"⚠️ No test predictions for model '{predictor.model_name}', showing sample data. "
+                       f"Run `python test_predictions.py --model {predictor.model_name}` to create them.")
+        
         # Model Performance Metrics - Will show REALISTIC metrics now
         st.subheader("📊 Model Performance Metrics")
         metrics = predictor.get_metrics()
@@ -167,12 +190,66 @@ if st.session_state.model_loaded:
         else:
             st.error("❌ Could not load model metrics.")
         
+        # Threshold Explorer - metrics at any operating point from cached histograms
+        st.subheader("🎚️ Threshold Explorer")
+        best_t, best_f1 = predictor.get_best_threshold("f1_score")
+        threshold = st.slider("Decision Threshold", 0.0, 1.0, 0.5, 0.01,
+                              help=f"Best F1 ({best_f1:.4f}) at threshold {best_t:.2f}")
+        t_metrics = predictor.get_metrics_at(threshold)
+        st.caption("Raw metrics computed from the prediction set at the chosen threshold. "
+                   "The performance metrics above are adjusted display values and can differ at 0.5.")
+        
+        t_col1, t_col2 = st.columns([1, 1])
+        with t_col1:
+            st.metric("Raw Accuracy", f"{t_metrics['accuracy']:.4f}")
+            st.metric("Raw Precision", f"{t_metrics['precision']:.4f}")
+            st.metric("Raw Recall", f"{t_metrics['recall']:.4f}")
+            st.metric("Raw F1-Score", f"{t_metrics['f1_score']:.4f}")
+            st.metric("Raw IoU", f"{t_metrics['iou']:.4f}")
+        with t_col2:
+            recall, precision = predictor.get_pr_curve()
+            fig_pr, ax_pr = plt.subplots(figsize=(5, 4))
+            ax_pr.plot(recall, precision, linewidth=2, color='#2563eb')
+            ax_pr.scatter([t_metrics['recall']], [t_metrics['precision']], color='red', zorder=3,
+                          label=f"Threshold {threshold:.2f}")
+            ax_pr.set_xlabel("Recall")
+            ax_pr.set_ylabel("Precision")
+            ax_pr.set_title("Precision-Recall Curve", fontweight='bold')
+            ax_pr.set_xlim(0, 1)
+            ax_pr.set_ylim(0, 1.05)
+            ax_pr.grid(True, alpha=0.3)
+            ax_pr.legend()
+            st.pyplot(fig_pr)
+            plt.close(fig_pr)
+        
         # Urban Growth Visualization
         st.subheader("🖼️ Urban Growth Prediction Visualization")
         
         if predictor.predictions is not None:
             max_index = len(predictor.predictions) - 1 if len(predictor.predictions) > 0 else 0
-            idx = st.slider("Select Sample Index", 0, max(max_index, 5), 0,
+            
+            # Location lookup through the patch manifest's spatial index
+            if predictor.patch_index is not None:
+                with st.expander("📍 Find Tile by Location"):
+                    loc_col1, loc_col2, loc_col3 = st.columns([2, 2, 1])
+                    with loc_col1:
+                        lat = st.number_input("Latitude", value=18.5204, format="%.5f")
+                    with loc_col2:
+                        lon = st.number_input("Longitude", value=73.8567, format="%.5f")
+                    with loc_col3:
+                        st.write("")
+                        if st.button("🔍 Find", use_container_width=True):
+                            try:
+                                found = predictor.find_sample(lat, lon)
+                            except Exception as e:
+                                st.error(f"Location lookup failed: {e}")
+                            else:
+                                if found is None:
+                                    st.warning("No prediction tile covers this location")
+                                else:
+                                    st.session_state.sample_idx = found
+            
+            idx = st.slider("Select Sample Index", 0, max(max_index, 5), key="sample_idx",
                           help="Select different urban area samples to visualize predictions")
             
             sample_data = predictor.get_sample_data(idx)
@@ -2,30 +2,50 @@
 import numpy as np
 import tensorflow as tf
 import os
-from sklearn.metrics import accuracy_score, f1_score, jaccard_score, precision_score, recall_score
+import sys
 import matplotlib.pyplot as plt
 from pathlib import Path
 
+# Project root holds config.py and the shared pipeline modules
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from prediction_store import (
+    build_store, load_store, save_store, store_metrics, sample_maps, packed_predictions_path,
+)
+from threshold_sweep import sweep_store, metrics_at, best_threshold, pr_curve
+from config import GROWTH_TREND_YEARS, GROWTH_TREND
+from model_registry import model_path, DEFAULT_MODEL
+from patch_manifest import PatchManifest, PatchIndex
+
 class UrbanGrowthPredictor:
-    def __init__(self):
+    def __init__(self, model_name=DEFAULT_MODEL):
+        self.model_name = model_name
         self.model = None
-        self.predictions = None
-        self.ground_truth = None
+        self.store = None           # packed masks + uint8 probabilities
+        self.predictions = None     # uint8 probabilities (N, H, W, 1)
+        self.ground_truth = None    # bit-packed masks (N, ceil(H*W/8))
         self.metrics = None
+        self.curves = None          # metrics at every threshold (from histograms)
+        self.patch_index = None     # spatial index over the samples' patch manifest
+        self.data_source = None     # "model", "legacy" or "dummy"
         
         # Define paths - using the same logic as update_predictions.py
         current_dir = os.path.dirname(os.path.abspath(__file__))
         project_root = Path(current_dir).parent
         self.base_path = project_root  # "C:\Users\Lenovo\Desktop\LY MAJOR PROJECT"
         
-        self.model_path = self.base_path / "data" / "models" / "urban_growth_unet.h5"
+        self.model_path = model_path(model_name)  # registered teacher / student weights
         self.data_path = self.base_path / "data" / "predictions" / "test_predictions.npz"
+        self.packed_data_path = self.base_path / "data" / "predictions" / "test_predictions_packed.npz"
+        self.model_data_path = packed_predictions_path(model_name)  # written with the manifest
+        self.manifest_path = self.base_path / "data" / "predictions" / "test_patch_manifest.npz"
         
         print(f"Looking for model at: {self.model_path}")
         print(f"Looking for data at: {self.data_path}")
         
         self.load_model()
         self.load_data()
+        self.load_manifest()
         self.calculate_real_metrics()
     
     def load_model(self):
@@ -48,16 +68,46 @@ class UrbanGrowthPredictor:
             self.model = None
             return False
     
+    def set_store(self, store):
+        """Use a packed prediction store for metrics and visualization"""
+        self.store = store
+        self.predictions = store["pred_q"]
+        self.ground_truth = store["gt_bits"]
+        self.curves = None
+    
     def load_data(self):
-        """Load prediction data"""
+        """Load prediction data (packed store preferred, dense .npz converted once)"""
         try:
-            if os.path.exists(self.data_path):
-                print(f"✅ Data file found at: {self.data_path}")
-                data = np.load(self.data_path)
-                self.predictions = data["predictions"]
-                self.ground_truth = data["ground_truth"]
+            if os.path.exists(self.model_data_path):
+                print(f"✅ Test predictions found at: {self.model_data_path}")
+                self.set_store(load_store(self.model_data_path))
+                self.data_source = "model"
+                print(f"✅ Prediction data loaded successfully. Shape: {self.predictions.shape}")
+                return True
+            elif self.model_name != DEFAULT_MODEL:
+                # The legacy files hold the default model's predictions only
+                print(f"❌ No test predictions for '{self.model_name}' at: {self.model_data_path}")
+                print("⚠️ Generating realistic dummy data instead")
+                self.generate_realistic_dummy_data()
+                return False
+            elif os.path.exists(self.packed_data_path) and (
+                not os.path.exists(self.data_path)
+                or os.path.getmtime(self.packed_data_path) >= os.path.getmtime(self.data_path)
+            ):
+                print(f"✅ Packed data file found at: {self.packed_data_path}")
+                self.set_store(load_store(self.packed_data_path))
+                self.data_source = "legacy"
                 print(f"✅ Prediction data loaded successfully. Shape: {self.predictions.shape}")
                 return True
+            elif os.path.exists(self.data_path):
+                print(f"✅ Data file found at: {self.data_path}")
+                with np.load(self.data_path) as data:
+                    store = build_store(data["predictions"], data["ground_truth"])
+                save_store(self.packed_data_path, store)
+                self.set_store(load_store(self.packed_data_path))
+                self.data_source = "legacy"
+                print(f"✅ Prediction data packed to: {self.packed_data_path}. Shape: {self.predictions.shape}")
+                return True
             else:
                 print(f"❌ Predictions file not found at: {self.data_path}")
                 print("⚠️ Generating realistic dummy data instead")
@@ -69,6 +119,35 @@ class UrbanGrowthPredictor:
             self.generate_realistic_dummy_data()
             return False
     
+    def load_manifest(self):
+        """Load the patch manifest (scene position of every sample) if present"""
+        try:
+            if os.path.exists(self.manifest_path):
+                manifest = PatchManifest.load(self.manifest_path)
+                if not manifest.georeferenced:
+                    print("⚠️ Patch manifest has no CRS (pixel grid only), location lookup disabled")
+                    self.patch_index = None
+                    return False
+                # Same split id = same samples in the same order (a length match is not enough)
+                split_id = self.store.get("split_id")
+                if (manifest.split_id is not None and split_id is not None
+                        and manifest.split_id == str(split_id) and len(manifest) == len(self.predictions)):
+                    self.patch_index = PatchIndex(manifest)
+                    print(f"✅ Patch manifest loaded: {len(manifest)} georeferenced samples")
+                    return True
+                print("⚠️ Patch manifest does not match prediction data, location lookup disabled")
+        except Exception as e:
+            print(f"❌ Error loading patch manifest: {e}")
+        self.patch_index = None
+        return False
+    
+    def find_sample(self, lat, lon):
+        """Sample index of the patch covering a WGS84 location (None if not covered)"""
+        if self.patch_index is None:
+            return None
+        hits = self.patch_index.query_point(lon, lat, crs="EPSG:4326")
+        return hits[0] if hits else None
+    
     def generate_realistic_dummy_data(self):
         """Generate realistic dummy data (not perfect)"""
         np.random.seed(42)
@@ -76,8 +155,8 @@ class UrbanGrowthPredictor:
         height, width = 64, 64
         
         # Create more realistic patterns (not just random)
-        self.ground_truth = np.zeros((n_samples, height, width, 1))
-        self.predictions = np.zeros((n_samples, height, width, 1))
+        ground_truth = np.zeros((n_samples, height, width, 1), dtype=bool)
+        predictions = np.zeros((n_samples, height, width, 1), dtype="float32")
         
         for i in range(n_samples):
             # Create urban area patterns
@@ -108,9 +187,11 @@ class UrbanGrowthPredictor:
             pred = pred + noise
             pred = np.clip(pred, 0, 1)
             
-            self.ground_truth[i] = gt.reshape(height, width, 1)
-            self.predictions[i] = pred.reshape(height, width, 1)
+            ground_truth[i] = gt.reshape(height, width, 1) > 0.5
+            predictions[i] = pred.reshape(height, width, 1)
         
+        self.set_store(build_store(predictions, ground_truth))
+        self.data_source = "dummy"
         print(f"✅ Generated realistic dummy data: {self.predictions.shape}")
     
     def calculate_real_metrics(self):
@@ -119,16 +200,13 @@ class UrbanGrowthPredictor:
             self.generate_realistic_dummy_data()
         
         try:
-            # Flatten arrays for metric calculation
-            y_true_flat = self.ground_truth.flatten() > 0.5
-            y_pred_flat = self.predictions.flatten() > 0.5
-            
-            # Calculate metrics
-            acc = accuracy_score(y_true_flat, y_pred_flat)
-            f1 = f1_score(y_true_flat, y_pred_flat, zero_division=0)
-            iou = jaccard_score(y_true_flat, y_pred_flat, zero_division=0)
-            prec = precision_score(y_true_flat, y_pred_flat, zero_division=0)
-            rec = recall_score(y_true_flat, y_pred_flat, zero_division=0)
+            # Popcount over the packed masks (no unpacking / flattening)
+            raw = store_metrics(self.store)
+            acc = raw["accuracy"]
+            f1 = raw["f1_score"]
+            iou = raw["iou"]
+            prec = raw["precision"]
+            rec = raw["recall"]
             
             # Ensure metrics are realistic (not perfect 1.0)
             # If metrics are too perfect (>0.99), make them more realistic
@@ -167,6 +245,26 @@ class UrbanGrowthPredictor:
         """Return metrics"""
         return self.metrics
     
+    def get_threshold_curves(self):
+        """Metrics at every threshold, built once from probability histograms"""
+        if self.curves is None:
+            if self.store is None:
+                self.generate_realistic_dummy_data()
+            self.curves = sweep_store(self.store)
+        return self.curves
+    
+    def get_metrics_at(self, threshold):
+        """Unadjusted metrics at a given decision threshold"""
+        return metrics_at(self.get_threshold_curves(), threshold)
+    
+    def get_best_threshold(self, metric="f1_score"):
+        """Threshold that maximises a metric -> (threshold, value)"""
+        return best_threshold(self.get_threshold_curves(), metric)
+    
+    def get_pr_curve(self):
+        """Precision-recall curve -> (recall, precision)"""
+        return pr_curve(self.get_threshold_curves())
+    
     def get_sample_data(self, index):
         """Get sample data for visualization"""
         if self.ground_truth is None or self.predictions is None:
@@ -176,21 +274,14 @@ class UrbanGrowthPredictor:
             index = 0
         
         try:
-            return {
-                "ground_truth": self.ground_truth[index, :, :, 0],
-                "prediction": self.predictions[index, :, :, 0],
-                "difference": np.abs(self.ground_truth[index, :, :, 0] - self.predictions[index, :, :, 0])
-            }
+            return sample_maps(self.store, index)
         except Exception as e:
             print(f"❌ Error getting sample data: {e}")
             return None
     
     def get_growth_trend(self):
         """Get urban growth trend data"""
-        years = [2000, 2005, 2010, 2015, 2020, 2025, 2030, 2035, 2040]
-        # Realistic growth curve
-        growth = [10, 18, 25, 40, 55, 68, 78, 85, 88]
-        return years, growth
+        return list(GROWTH_TREND_YEARS), list(GROWTH_TREND)
     
     def make_prediction(self, input_data):
         """Make predictions using the actual model if available"""
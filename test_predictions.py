@@ -0,0 +1,86 @@
+"""
+Test-split prediction sets for the dashboard.
+
+Scores a registered model on the test split of the shared patch store and
+writes, in the same step and the same test-index order:
+    test_predictions_<model>_packed.npz   packed masks + uint8 probabilities
+    test_patch_manifest.npz               scene position of every sample
+so sample i of the predictions is row i of the manifest. Both record the
+split id (PatchStore.split_id); the dashboard only enables "Find Tile by
+Location" when the ids match. A model is only scored on the split it was
+trained on (registry split_id): on any other split its training tiles
+could sit in the test set.
+
+Usage:
+    python test_predictions.py                 # default model
+    python test_predictions.py --model unet_lite
+"""
+import argparse
+
+from config import PREDICTIONS_DIR
+import pipeline
+from model_registry import load_registry, model_path, DEFAULT_MODEL
+from patch_store import PatchStore, patch_store_path
+from prediction_store import build_store, save_store, store_metrics, packed_predictions_path
+
+TEST_MANIFEST_PATH = PREDICTIONS_DIR / "test_patch_manifest.npz"
+
+
+def require_split(model_name, split_id):
+    """Refuse to score a model that was not trained on this split"""
+    trained = load_registry().get(model_name, {}).get("split_id")
+    if trained is None or trained != split_id:
+        raise ValueError(f"Model '{model_name}' was trained on split {trained or 'unknown'}, "
+                         f"the current test split is {split_id}; its training tiles may be in "
+                         "the test set. Retrain it on this split (`python unet.py`).")
+
+
+def write_test_predictions(model_name=DEFAULT_MODEL, weights=None, scheme=None, batch_size=32):
+    """Score a model on the test split; returns the packed prediction store"""
+    from unet import load_train_config
+
+    scheme = scheme or load_train_config()["split_scheme"]
+    info = load_registry().get(model_name, {})
+    # Models trained with the road network bands are scored on that store
+    store = PatchStore(patch_store_path(info.get("road_network", False)))
+    if info.get("input_shape") and info["input_shape"][-1] != store.patch_shape[-1]:
+        raise ValueError(f"Model '{model_name}' takes {info['input_shape'][-1]} bands, "
+                         f"patch store {store.path} has {store.patch_shape[-1]}")
+    if store.labels is None:
+        raise ValueError(f"Patch store {store.path} has no labels.npy, rebuild it with "
+                         "`python splits.py --rebuild`")
+    index = store.load_split(scheme)["test"]
+    split_id = store.split_id(scheme)
+    require_split(model_name, split_id)
+
+    preds = pipeline.run_inference_quantized(store.codes[index], store.scale, store.offset,
+                                             weights or model_path(model_name), batch_size)
+    predictions = build_store(preds, store.labels[index])
+    predictions["model"] = model_name
+    predictions["split_id"] = split_id
+    save_store(packed_predictions_path(model_name), predictions)
+    manifest = store.manifest.subset(index)
+    manifest.split_id = predictions["split_id"]
+    manifest.save(TEST_MANIFEST_PATH)
+    print(f"✅ {len(index)} test predictions of '{model_name}' → {packed_predictions_path(model_name)}")
+    return predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write test-split predictions and their patch manifest")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--scheme", default=None, help="Split scheme (default: train_config.json)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    try:
+        predictions = write_test_predictions(args.model, scheme=args.scheme, batch_size=args.batch_size)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    for name, value in store_metrics(predictions).items():
+        print(f"   {name}: {value:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from feature_store import FeatureStore, write_feature_store, band_encoding, quantize, dequantize
+from pipeline import create_patches
+
+P = 16
+
+
+@pytest.fixture
+def features():
+    rng = np.random.default_rng(2)
+    # Not a multiple of the tile size: the store pads, create_patches drops
+    stack = rng.normal(size=(3 * P + 5, 4 * P + 3, 4)).astype("float32")
+    stack[..., 1] *= 1000.0
+    return stack
+
+
+def test_uint16_round_trip_within_half_a_step(features):
+    scale, offset = band_encoding(features)
+    restored = dequantize(quantize(features, scale, offset), scale, offset)
+    step = np.asarray(scale, dtype="float32")
+    # float32 dequantization adds a little on top of the half-step rounding
+    assert np.all(np.abs(restored - features) <= 0.5 * step + 1e-5 * np.abs(features).max(axis=(0, 1)))
+
+
+def test_tiles_match_create_patches(features, tmp_path):
+    store = write_feature_store(features, tmp_path / "store", band_names=list("abcd"), chunk=P)
+    expected = create_patches(dequantize(quantize(features, store.scale, store.offset),
+                                         store.scale, store.offset), P)
+
+    assert store.n_tiles == len(expected)
+    np.testing.assert_array_equal(store.read_tiles(), expected)
+    tile_index = [5, 0, 11]
+    np.testing.assert_array_equal(store.read_tiles(tile_index), expected[tile_index])
+
+
+def test_window_and_reload(features, tmp_path):
+    write_feature_store(features, tmp_path / "store", band_names=list("abcd"), chunk=P)
+    store = FeatureStore(tmp_path / "store")
+
+    assert store.shape == features.shape
+    assert store.bands == list("abcd")
+    window = store.read_window(7, 40, 3, 50)
+    assert window.shape == (33, 47, 4)
+    assert np.all(np.abs(window - features[7:40, 3:50]) <= store.scale)
+
+
+def test_nan_pixels_are_masked(features, tmp_path):
+    features[4, 6, 2] = np.nan
+    store = write_feature_store(features, tmp_path / "store", band_names=list("abcd"), chunk=P)
+
+    usable = store.mask("usable")
+    assert store.has_mask("usable")
+    assert not usable[4, 6] and usable.sum() == usable.size - 1
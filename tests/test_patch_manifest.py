@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from patch_manifest import PatchManifest, PatchIndex, stitch_predictions
+
+P = 8
+# 10 m pixels, north-up, origin at (500000, 2000000)
+META = {"transform": (10.0, 0.0, 500000.0, 0.0, -10.0, 2000000.0), "crs": "EPSG:32643",
+        "height": 5 * P, "width": 6 * P}
+
+
+@pytest.fixture
+def manifest():
+    # Every other tile, in shuffled order, as a split subset would be
+    tiles = np.random.default_rng(3).permutation(np.arange(0, 30, 2))
+    return PatchManifest.from_tiles("Pune", "S1", META, tiles, P)
+
+
+def brute_force_bbox(manifest, minx, miny, maxx, maxy):
+    hits = []
+    for i in range(len(manifest)):
+        x0, y0, x1, y1 = manifest.bounds(i)
+        if x0 < maxx and minx < x1 and y0 < maxy and miny < y1:
+            hits.append(i)
+    return sorted(hits)
+
+
+def test_point_query_matches_bounds(manifest):
+    index = PatchIndex(manifest)
+    rng = np.random.default_rng(4)
+    xs = rng.uniform(500000, 500000 + 10 * META["width"], 200)
+    ys = rng.uniform(2000000 - 10 * META["height"], 2000000, 200)
+    for x, y in zip(xs, ys):
+        expected = [i for i in range(len(manifest))
+                    if manifest.bounds(i)[0] <= x < manifest.bounds(i)[2]
+                    and manifest.bounds(i)[1] < y <= manifest.bounds(i)[3]]
+        assert index.query_point(x, y) == expected
+
+
+def test_bbox_query_matches_brute_force(manifest):
+    index = PatchIndex(manifest)
+    for box in [(500005, 1999700, 500200, 1999990), (499000, 1990000, 501000, 2001000),
+                (500170, 1999700, 500330, 1999850)]:
+        assert sorted(index.query_bbox(*box)) == brute_force_bbox(manifest, *box)
+    assert index.query_bbox(400000, 1000000, 400010, 1000010) == []
+
+
+def test_tile_index_and_stitch(manifest):
+    tiles = manifest.tile_index()
+    predictions = np.stack([np.full((P, P, 1), t, dtype="float32") for t in tiles])
+    mosaic = stitch_predictions(predictions, manifest, "S1")
+
+    cols = META["width"] // P
+    for t in tiles:
+        r, c = divmod(int(t), cols)
+        assert np.all(mosaic[r * P:(r + 1) * P, c * P:(c + 1) * P] == t)
+    assert np.isnan(mosaic[0:P, P:2 * P]).all()     # tile 1 is not in the manifest
+
+
+def test_save_load_keeps_split_id_and_missing_crs(tmp_path):
+    meta = dict(META, crs=None)
+    manifest = PatchManifest.from_tiles("Pune", "S1", meta, [3, 1, 4], P)
+    manifest.split_id = "abc123"
+    assert manifest.scenes["S1"]["crs"] is None and not manifest.georeferenced
+    assert manifest.subset([2, 0]).split_id == "abc123"
+    assert PatchManifest.concat([manifest, manifest.subset([0])]).split_id == "abc123"
+
+    manifest.save(tmp_path / "manifest.npz")
+    loaded = PatchManifest.load(tmp_path / "manifest.npz")
+    assert loaded.split_id == "abc123"
+    assert loaded.scenes["S1"]["crs"] is None
+    np.testing.assert_array_equal(loaded.tile_index(), [3, 1, 4])
+    with pytest.raises(ValueError):
+        PatchIndex(loaded).query_point(73.85, 18.52, crs="EPSG:4326")
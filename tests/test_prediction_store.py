@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from prediction_store import build_store, load_store, save_store, store_metrics, sample_maps
+
+
+def reference_metrics(gt, pred):
+    """Metrics from dense boolean masks"""
+    tp = np.sum(gt & pred)
+    fp = np.sum(~gt & pred)
+    fn = np.sum(gt & ~pred)
+    tn = np.sum(~gt & ~pred)
+    return {
+        "accuracy": (tp + tn) / gt.size,
+        "precision": tp / (tp + fp),
+        "recall": tp / (tp + fn),
+        "f1_score": 2 * tp / (2 * tp + fp + fn),
+        "iou": tp / (tp + fp + fn),
+    }
+
+
+@pytest.fixture
+def dense():
+    rng = np.random.default_rng(0)
+    # 7 x 9 pixels: the packed rows need padding bits
+    ground_truth = (rng.random((12, 7, 9, 1)) > 0.6).astype("float32")
+    predictions = np.clip(ground_truth * 0.6 + rng.random(ground_truth.shape) * 0.5, 0, 1)
+    return predictions.astype("float32"), ground_truth
+
+
+def test_packed_metrics_match_numpy(dense, tmp_path):
+    predictions, ground_truth = dense
+    save_store(tmp_path / "store.npz", build_store(predictions, ground_truth))
+    metrics = store_metrics(load_store(tmp_path / "store.npz"))
+
+    expected = reference_metrics(ground_truth > 0.5, predictions > 0.5)
+    for name, value in expected.items():
+        assert metrics[name] == pytest.approx(value)
+
+
+def test_sample_maps_round_trip(dense):
+    predictions, ground_truth = dense
+    maps = sample_maps(build_store(predictions, ground_truth), 3)
+
+    np.testing.assert_array_equal(maps["ground_truth"], ground_truth[3, ..., 0])
+    # uint8 probabilities: within half a quantization step
+    np.testing.assert_allclose(maps["prediction"], predictions[3, ..., 0], atol=0.5 / 255 + 1e-6)
+
+
+def test_empty_store_scores_zero():
+    empty = np.zeros((0, 8, 8, 1), dtype="float32")
+    metrics = store_metrics(build_store(empty, empty))
+    assert all(value == 0.0 for value in metrics.values())
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import road_network
+from road_network import build_graph, network_centrality, node_degree, to_networkx
+
+
+@pytest.fixture(params=[0, 1])
+def graph(request):
+    rng = np.random.default_rng(request.param)
+    points = rng.integers(0, 8, (50, 2)).astype("float64")
+    start, end = points[rng.integers(0, 50, 90)], points[rng.integers(0, 50, 90)]
+    # Integer lengths give many equal-length paths; a few tiny fragments stay disconnected
+    length = np.rint(np.linalg.norm(start - end, axis=1)) + 1
+    return build_graph(start, end, length)
+
+
+def test_centrality_with_all_sources_matches_networkx(graph):
+    nx = pytest.importorskip("networkx")
+    n = len(graph["node_xy"])
+    betweenness, closeness = network_centrality(graph, samples=n, workers=1)
+
+    G = to_networkx(graph)
+    exact_b = nx.betweenness_centrality(G, weight="length", normalized=True)
+    exact_c = nx.closeness_centrality(G, distance="length")
+    np.testing.assert_allclose(betweenness, [exact_b[i] for i in range(n)], rtol=1e-5, atol=1e-7)
+    np.testing.assert_allclose(closeness, [exact_c[i] for i in range(n)], rtol=1e-5, atol=1e-7)
+
+
+def test_path_counts_match_networkx(graph):
+    nx = pytest.importorskip("networkx")
+    G = to_networkx(graph)
+    adjacency = road_network.to_adjacency(graph)
+    for s in range(0, len(graph["node_xy"]), 7):
+        order, pred, sigma, dist = road_network.shortest_paths(adjacency, s)
+        assert dist == pytest.approx(nx.single_source_dijkstra_path_length(G, s, weight="length"))
+        for v in order:
+            expected = len(list(nx.all_shortest_paths(G, s, v, weight="length")))
+            assert sigma[v] == expected
+
+
+def test_build_graph_snaps_and_dedupes():
+    start = np.array([[0.0, 0.0], [0.1, 0.1], [1.0, 0.0], [2.0, 2.0]])
+    end = np.array([[1.0, 0.0], [1.1, 0.0], [0.0, 0.0], [2.0, 2.0]])
+    graph = build_graph(start, end, np.array([5.0, 3.0, 4.0, 1.0]), snap=0.5)
+
+    # Snapped duplicates keep the shortest length; the self-loop is dropped
+    assert len(graph["u"]) == 1 and graph["length"][0] == 3.0
+    assert node_degree(graph).tolist() == [1, 1, 0]
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from patch_manifest import PatchManifest
+from patch_store import PatchStore, write_patch_store
+from splits import random_split, spatial_block_split, make_split
+
+P = 4
+META = {"transform": (1.0, 0.0, 0.0, 0.0, 1.0, 0.0), "crs": None, "height": 24 * P, "width": 20 * P}
+
+
+@pytest.fixture
+def manifest():
+    return PatchManifest.from_tiles("Pune", "S1", META, np.arange(24 * 20), P)
+
+
+def test_random_split_is_a_partition():
+    splits = random_split(101)
+    joined = np.concatenate([splits["train"], splits["val"], splits["test"]])
+    assert sorted(joined) == list(range(101))
+    assert len(splits["train"]) == 71 and len(splits["val"]) == 15
+
+
+@pytest.mark.parametrize("buffer_tiles", [1, 2])
+def test_buffer_keeps_train_tiles_away_from_held_out(manifest, buffer_tiles):
+    splits = spatial_block_split(manifest, block_tiles=4, buffer_tiles=buffer_tiles)
+    tile_row, tile_col = manifest.row_off // P, manifest.col_off // P
+    held_out = np.concatenate([splits["val"], splits["test"]])
+    assert len(splits["train"]) and len(held_out)
+
+    # Chebyshev distance from every train tile to the nearest val/test tile
+    dr = np.abs(tile_row[splits["train"], None] - tile_row[None, held_out])
+    dc = np.abs(tile_col[splits["train"], None] - tile_col[None, held_out])
+    assert np.maximum(dr, dc).min() > buffer_tiles
+
+
+def test_spatial_split_keeps_blocks_together(manifest):
+    splits = spatial_block_split(manifest, block_tiles=4)
+    block = (manifest.row_off // P // 4) * 100 + manifest.col_off // P // 4
+    blocks = [set(block[splits[name]]) for name in ("train", "val", "test")]
+    assert not (blocks[0] & blocks[1]) and not (blocks[0] & blocks[2]) and not (blocks[1] & blocks[2])
+    assert sum(len(splits[name]) for name in splits) == len(manifest)
+
+
+def test_split_id_follows_the_indices(manifest, tmp_path):
+    codes = np.zeros((len(manifest), P, P, 2), dtype=np.uint16)
+    store = write_patch_store(tmp_path / "store", codes, np.ones(2), np.zeros(2), manifest)
+
+    make_split(store, "random", seed=1)
+    first = PatchStore(store.path).split_id("random")
+    make_split(store, "random", seed=1)
+    assert PatchStore(store.path).split_id("random") == first
+    make_split(store, "random", seed=2)
+    assert PatchStore(store.path).split_id("random") != first
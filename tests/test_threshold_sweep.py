@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from prediction_store import build_store, dequantize_probabilities, store_metrics, unpack_masks
+from threshold_sweep import sweep_store, metrics_at, best_threshold
+
+
+@pytest.fixture
+def store():
+    rng = np.random.default_rng(1)
+    ground_truth = (rng.random((10, 16, 16, 1)) > 0.5).astype("float32")
+    predictions = np.clip(ground_truth * 0.4 + rng.random(ground_truth.shape) * 0.6, 0, 1)
+    return build_store(predictions.astype("float32"), ground_truth)
+
+
+def test_sweep_at_0_3_matches_dense_threshold(store):
+    curves = sweep_store(store)
+    metrics = metrics_at(curves, 0.3)
+
+    # Thresholds apply to the quantized probabilities
+    gt = unpack_masks(store["gt_bits"], store["sample_shape"]).astype(bool)
+    pred = dequantize_probabilities(store["pred_q"], int(store["scale"])).reshape(gt.shape) > 0.3
+    tp, fp = np.sum(gt & pred), np.sum(~gt & pred)
+    fn, tn = np.sum(gt & ~pred), np.sum(~gt & ~pred)
+
+    assert metrics["precision"] == pytest.approx(tp / (tp + fp))
+    assert metrics["recall"] == pytest.approx(tp / (tp + fn))
+    assert metrics["f1_score"] == pytest.approx(2 * tp / (2 * tp + fp + fn))
+    assert metrics["iou"] == pytest.approx(tp / (tp + fp + fn))
+    assert metrics["accuracy"] == pytest.approx((tp + tn) / gt.size)
+
+
+def test_sweep_at_store_threshold_matches_packed_metrics(store):
+    metrics = metrics_at(sweep_store(store), float(store["threshold"]))
+    for name, value in store_metrics(store).items():
+        assert metrics[name] == pytest.approx(value, abs=1e-3)
+
+
+def test_best_threshold_is_on_the_curve(store):
+    curves = sweep_store(store)
+    threshold, f1 = best_threshold(curves)
+    assert f1 == pytest.approx(curves["f1_score"].max())
+    assert metrics_at(curves, threshold)["f1_score"] == pytest.approx(f1)
@@ -0,0 +1,96 @@
+"""
+Threshold sweep from probability histograms.
+
+One pass over a packed prediction store builds, for each ground-truth
+class, a histogram of the uint8 quantized probabilities. Confusion counts
+for every threshold then come from cumulative sums of those histograms,
+so precision / recall / F1 / IoU at any operating point (and the whole PR
+curve) cost nothing extra.
+
+Thresholds are applied to the quantized probabilities (q / scale > t).
+"""
+import numpy as np
+
+from prediction_store import unpack_masks
+
+CHUNK_SAMPLES = 256
+
+
+def probability_histograms(store, chunk_samples=CHUNK_SAMPLES):
+    """Per-class histograms of quantized probabilities -> (neg_hist, pos_hist)"""
+    n_bins = store["scale"] + 1
+    shape = store["sample_shape"]
+    pos_hist = np.zeros(n_bins, dtype=np.int64)
+    all_hist = np.zeros(n_bins, dtype=np.int64)
+
+    n_samples = store["pred_q"].shape[0]
+    for start in range(0, n_samples, chunk_samples):
+        stop = min(start + chunk_samples, n_samples)
+        q = store["pred_q"][start:stop].reshape(-1)
+        gt = unpack_masks(store["gt_bits"][start:stop], shape).reshape(-1).astype(bool)
+        all_hist += np.bincount(q, minlength=n_bins)
+        pos_hist += np.bincount(q[gt], minlength=n_bins)
+
+    return all_hist - pos_hist, pos_hist
+
+
+def sweep(neg_hist, pos_hist, scale=None):
+    """Confusion counts and metrics for every threshold level
+
+    Entry k predicts "urban" for q > k, i.e. threshold k / scale.
+    """
+    scale = len(pos_hist) - 1 if scale is None else scale
+    # Counts strictly above each bin: tail[k] = sum(hist[k+1:])
+    tp = np.cumsum(pos_hist[::-1])[::-1] - pos_hist
+    fp = np.cumsum(neg_hist[::-1])[::-1] - neg_hist
+    fn = pos_hist.sum() - tp
+    tn = neg_hist.sum() - fp
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+        iou = np.where(tp + fp + fn > 0, tp / (tp + fp + fn), 0.0)
+    total = tp + fp + fn + tn
+
+    return {
+        "thresholds": np.arange(len(pos_hist)) / scale,
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "accuracy": (tp + tn) / np.maximum(total, 1),
+        "precision": precision,
+        "recall": recall,
+        "f1_score": f1,
+        "iou": iou,
+    }
+
+
+def sweep_store(store):
+    """Histogram a packed store and sweep every threshold"""
+    neg_hist, pos_hist = probability_histograms(store)
+    return sweep(neg_hist, pos_hist, store["scale"])
+
+
+def threshold_index(curves, threshold):
+    """Sweep entry that matches "probability > threshold\""""
+    scale = len(curves["thresholds"]) - 1
+    return int(np.clip(np.floor(threshold * scale + 1e-9), 0, scale))
+
+
+def metrics_at(curves, threshold):
+    """Metrics dict at one threshold"""
+    k = threshold_index(curves, threshold)
+    return {
+        name: float(curves[name][k])
+        for name in ("accuracy", "precision", "recall", "f1_score", "iou")
+    }
+
+
+def best_threshold(curves, metric="f1_score"):
+    """Threshold that maximises a metric"""
+    k = int(np.argmax(curves[metric]))
+    return float(curves["thresholds"][k]), float(curves[metric][k])
+
+
+def pr_curve(curves):
+    """(recall, precision) arrays ordered by increasing recall"""
+    return curves["recall"][::-1], curves["precision"][::-1]
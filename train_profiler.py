@@ -0,0 +1,138 @@
+"""
+Training throughput profiler and batch-size tuner.
+
+Runs short trial epochs of build_simple_unet for every batch size /
+thread setting, each in a fresh process so thread pools and peak RSS are
+measured cleanly. Reports samples/sec, time waiting on input vs compute,
+and peak RSS, then saves the fastest configuration that fits the memory
+budget to train_config.json for the real run (unet.train_unet).
+
+Usage:
+    python train_profiler.py --batch-sizes 8 16 32 64 --threads 1 2 4 --memory-budget-mb 4096
+"""
+import argparse
+import json
+import multiprocessing
+import queue as queue_module
+import resource
+import sys
+import time
+
+from unet import (
+    build_simple_unet, split_dataset, load_train_config, apply_thread_config, TRAIN_CONFIG_PATH,
+)
+
+WARMUP_STEPS = 3
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _trial(batch_size, threads, steps, queue):
+    """Run one profiling trial (in a child process) and report its stats"""
+    config = {"intra_op_threads": threads, "inter_op_threads": max(1, threads // 2) if threads else 0}
+    apply_thread_config(config)
+
+    # Same input pipeline and labels as the real run (per-batch dequantization)
+    dataset = split_dataset("train", batch_size, shuffle=True).repeat()
+    batches = iter(dataset)
+    model = build_simple_unet(dataset.element_spec[0].shape[1:])
+
+    input_wait = compute = 0.0
+    for step in range(WARMUP_STEPS + steps):
+        t0 = time.perf_counter()
+        xb, yb = next(batches)
+        t1 = time.perf_counter()
+        model.train_on_batch(xb, yb)
+        t2 = time.perf_counter()
+        if step >= WARMUP_STEPS:
+            input_wait += t1 - t0
+            compute += t2 - t1
+
+    total = input_wait + compute
+    queue.put({
+        "batch_size": batch_size,
+        "intra_op_threads": config["intra_op_threads"],
+        "inter_op_threads": config["inter_op_threads"],
+        "samples_per_sec": round(steps * batch_size / total, 2),
+        "input_wait_sec": round(input_wait, 3),
+        "compute_sec": round(compute, 3),
+        "input_wait_pct": round(100 * input_wait / total, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    })
+
+
+def run_trial(batch_size, threads, steps):
+    """Profile one configuration in a fresh process"""
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_trial, args=(batch_size, threads, steps, queue))
+    proc.start()
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=1)
+        except queue_module.Empty:
+            if not proc.is_alive():
+                break
+    proc.join()
+    if proc.exitcode != 0 or result is None:
+        # Usually an out-of-memory kill at large batch sizes
+        return {"batch_size": batch_size, "intra_op_threads": threads, "error": f"exit code {proc.exitcode}"}
+    return result
+
+
+def pick_best(results, memory_budget_mb):
+    """Fastest trial whose peak RSS fits the budget"""
+    fitting = [r for r in results if "error" not in r and r["peak_rss_mb"] <= memory_budget_mb]
+    return max(fitting, key=lambda r: r["samples_per_sec"]) if fitting else None
+
+
+def tune(batch_sizes, threads, steps, memory_budget_mb, save=True):
+    results = []
+    for t in threads:
+        for bs in batch_sizes:
+            r = run_trial(bs, t, steps)
+            results.append(r)
+            if "error" in r:
+                print(f"❌ batch={bs:<4} threads={t:<3} {r['error']}")
+            else:
+                print(f"batch={bs:<4} threads={t:<3} {r['samples_per_sec']:>9.1f} samples/s  "
+                      f"input wait {r['input_wait_pct']:>5.1f}%  peak RSS {r['peak_rss_mb']:.0f} MB")
+
+    best = pick_best(results, memory_budget_mb)
+    if best is None:
+        print(f"⚠️ No configuration fits within {memory_budget_mb} MB")
+        return results, None
+
+    print(f"✅ Best: batch={best['batch_size']} threads={best['intra_op_threads']} "
+          f"({best['samples_per_sec']} samples/s)")
+    if save:
+        config = load_train_config()
+        config.update({k: best[k] for k in ("batch_size", "intra_op_threads", "inter_op_threads")})
+        config["profile"] = results
+        with open(TRAIN_CONFIG_PATH, "w") as f:
+            json.dump(config, f, indent=2)
+        print("✅ Saved training config:", TRAIN_CONFIG_PATH)
+    return results, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile U-Net training throughput and tune batch size")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 16, 32, 64])
+    parser.add_argument("--threads", type=int, nargs="+", default=[0],
+                        help="intra-op thread counts to try (0 = TensorFlow default)")
+    parser.add_argument("--steps", type=int, default=20, help="Timed steps per trial")
+    parser.add_argument("--memory-budget-mb", type=float, default=4096)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    tune(args.batch_sizes, args.threads, args.steps, args.memory_budget_mb, save=not args.no_save)
+
+
+if __name__ == "__main__":
+    main()
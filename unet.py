@@ -0,0 +1,302 @@
+"""
+U-Net model and training run.
+
+build_simple_unet is the model of the training script that saves
+urban_growth_unet.h5 (32 → 64 → 128 → 64 → 32 filters, sigmoid
+urban-probability output); its batch_size=8 / epochs=5 run is the default.
+Training settings (batch size, epochs, thread counts) come from
+train_config.json, which train_profiler.py writes after tuning. A trained
+model is registered with the id of the split it was trained on, so it is
+never scored on a test split that overlaps its training tiles.
+
+Usage:
+    python unet.py                                        # default 7-band model
+    python unet.py --road-network --model unet_network    # + road network bands
+"""
+import argparse
+import json
+import numpy as np
+
+from config import PROCESSED_DIR, MODELS_DIR
+from model_registry import register_model, DEFAULT_MODEL
+
+UNET_PATH = MODELS_DIR / "urban_growth_unet.h5"
+STUDENT_PATH = MODELS_DIR / "urban_growth_unet_lite.h5"
+TRAIN_CONFIG_PATH = MODELS_DIR / "train_config.json"
+
+DEFAULT_TRAIN_CONFIG = {
+    "batch_size": 8,
+    "epochs": 5,
+    "split_scheme": "random",  # index split over the patch store (splits.py)
+    "intra_op_threads": 0,   # 0 = let TensorFlow decide
+    "inter_op_threads": 0,
+}
+
+
+def build_simple_unet(input_shape=(64, 64, 7)):
+    """Build a simplified U-Net model for better compatibility
+
+    Ported unchanged from the script that saves urban_growth_unet.h5: two
+    3x3 convolutions per level, UpSampling2D decoder without skip
+    connections, Adam / binary cross-entropy.
+    """
+    import tensorflow as tf
+    from tensorflow.keras import layers
+
+    inputs = tf.keras.Input(shape=input_shape)
+
+    # Encoder
+    # Block 1
+    x = layers.Conv2D(32, 3, activation='relu', padding='same')(inputs)
+    x = layers.Conv2D(32, 3, activation='relu', padding='same')(x)
+    x = layers.MaxPooling2D(2)(x)
+
+    # Block 2
+    x = layers.Conv2D(64, 3, activation='relu', padding='same')(x)
+    x = layers.Conv2D(64, 3, activation='relu', padding='same')(x)
+    x = layers.MaxPooling2D(2)(x)
+
+    # Block 3 (Bottleneck)
+    x = layers.Conv2D(128, 3, activation='relu', padding='same')(x)
+    x = layers.Conv2D(128, 3, activation='relu', padding='same')(x)
+
+    # Decoder
+    # Block 4
+    x = layers.UpSampling2D(2)(x)
+    x = layers.Conv2D(64, 3, activation='relu', padding='same')(x)
+    x = layers.Conv2D(64, 3, activation='relu', padding='same')(x)
+
+    # Block 5
+    x = layers.UpSampling2D(2)(x)
+    x = layers.Conv2D(32, 3, activation='relu', padding='same')(x)
+    x = layers.Conv2D(32, 3, activation='relu', padding='same')(x)
+
+    # Output layer
+    outputs = layers.Conv2D(1, 1, activation='sigmoid')(x)
+
+    model = tf.keras.Model(inputs, outputs)
+    model.compile(
+        optimizer='adam',
+        loss='binary_crossentropy',
+        metrics=['accuracy', 'mae']
+    )
+    return model
+
+
+def build_student_unet(input_shape=(64, 64, 7), filters=(8, 16, 32)):
+    """Lightweight U-Net for high-throughput scoring
+
+    Same layout and compile settings as build_simple_unet with far fewer
+    filters and depthwise-separable convolutions after the first layer.
+    """
+    import tensorflow as tf
+    from tensorflow.keras import layers
+
+    f1, f2, f3 = filters
+    inputs = tf.keras.Input(shape=input_shape)
+
+    # Encoder
+    x = layers.Conv2D(f1, 3, activation='relu', padding='same')(inputs)
+    x = layers.SeparableConv2D(f1, 3, activation='relu', padding='same')(x)
+    x = layers.MaxPooling2D(2)(x)
+
+    x = layers.SeparableConv2D(f2, 3, activation='relu', padding='same')(x)
+    x = layers.SeparableConv2D(f2, 3, activation='relu', padding='same')(x)
+    x = layers.MaxPooling2D(2)(x)
+
+    # Bottleneck
+    x = layers.SeparableConv2D(f3, 3, activation='relu', padding='same')(x)
+    x = layers.SeparableConv2D(f3, 3, activation='relu', padding='same')(x)
+
+    # Decoder
+    x = layers.UpSampling2D(2)(x)
+    x = layers.SeparableConv2D(f2, 3, activation='relu', padding='same')(x)
+    x = layers.SeparableConv2D(f2, 3, activation='relu', padding='same')(x)
+
+    x = layers.UpSampling2D(2)(x)
+    x = layers.SeparableConv2D(f1, 3, activation='relu', padding='same')(x)
+    x = layers.SeparableConv2D(f1, 3, activation='relu', padding='same')(x)
+
+    outputs = layers.Conv2D(1, 1, activation='sigmoid')(x)
+
+    model = tf.keras.Model(inputs, outputs, name="student_unet")
+    model.compile(
+        optimizer='adam',
+        loss='binary_crossentropy',
+        metrics=['accuracy', 'mae']
+    )
+    return model
+
+
+def _split_store(scheme, road_network=False):
+    """Patch store holding the split scheme, or None to use the legacy .npz splits
+
+    The road network store (10 bands) has no legacy fallback.
+    """
+    from patch_store import PatchStore, patch_store_path
+
+    if scheme is None:
+        scheme = load_train_config()["split_scheme"]
+    path = patch_store_path(road_network)
+    if (path / "meta.json").exists():
+        store = PatchStore(path)
+        if store.has_split(scheme):
+            return store, store.load_split(scheme)
+    if road_network:
+        raise FileNotFoundError(f"No '{scheme}' split in {path}, build it with "
+                                f"`python splits.py --road-network --scheme {scheme}`")
+    return None, None
+
+
+def current_split_id(scheme=None, road_network=False):
+    """(scheme, PatchStore.split_id) of the configured split; the id is None
+    when training falls back to the legacy .npz splits"""
+    scheme = scheme or load_train_config()["split_scheme"]
+    store, _ = _split_store(scheme, road_network)
+    return scheme, (store.split_id(scheme) if store is not None else None)
+
+
+def _require_labels(store):
+    if store.labels is None:
+        raise ValueError(f"Patch store {store.path} has no labels.npy, rebuild it with "
+                         "`python splits.py --rebuild`")
+
+
+def load_split(name, processed_dir=PROCESSED_DIR, scheme=None, road_network=False):
+    """(X, y) for a split
+
+    Reads through the index split of the shared patch store when one exists,
+    otherwise the train/val/test.npz files from notebook 05, whose masks are
+    derived with percentile_labels as in the training script. uint16 codes
+    (X_q + scale/offset) are dequantized here; use split_dataset to
+    dequantize per batch instead.
+    """
+    from feature_store import dequantize
+    from patch_store import percentile_labels
+
+    store, splits = _split_store(scheme, road_network)
+    if store is not None:
+        _require_labels(store)
+        return store.read(splits[name])
+
+    with np.load(processed_dir / f"{name}.npz") as data:
+        if "X_q" in data.files:
+            X = dequantize(data["X_q"], data["scale"], data["offset"])
+        else:
+            X = data["X"]
+        y = data["y"] if "y" in data.files else percentile_labels(X)
+    return X, y.astype("float32")
+
+
+def split_dataset(name, batch_size, shuffle=False, processed_dir=PROCESSED_DIR, scheme=None,
+                  weighted=False, road_network=False):
+    """tf.data pipeline over a split, dequantizing uint16 codes per batch
+
+    weighted=True adds the patch store's QA valid fraction as sample weights
+    (the legacy .npz splits have none and stay unweighted). road_network=True
+    reads the 10-band patch store.
+    """
+    import tensorflow as tf
+    from patch_store import percentile_labels
+
+    store, splits = _split_store(scheme, road_network)
+    if store is not None:
+        _require_labels(store)
+        index = splits[name]
+        x_shape = (None,) + tuple(store.patch_shape)
+        y_shape = (None,) + tuple(store.labels.shape[1:])
+        signature = (tf.TensorSpec(x_shape, tf.float32), tf.TensorSpec(y_shape, tf.float32))
+        if weighted:
+            signature += (tf.TensorSpec((None, 1, 1), tf.float32),)
+        return tf.data.Dataset.from_generator(
+            lambda: store.iter_batches(index, batch_size, shuffle, weighted=weighted),
+            output_signature=signature
+        ).prefetch(tf.data.AUTOTUNE)
+
+    with np.load(processed_dir / f"{name}.npz") as data:
+        if "X_q" in data.files:
+            X = data["X_q"]
+            scale = tf.constant(data["scale"], tf.float32)
+            offset = tf.constant(data["offset"], tf.float32)
+        else:
+            X, scale, offset = data["X"], 1.0, 0.0
+        y = data["y"] if "y" in data.files else percentile_labels(X)
+        y = y.astype("float32")
+
+    ds = tf.data.Dataset.from_tensor_slices((X, y))
+    if shuffle:
+        ds = ds.shuffle(min(len(X), 4096))
+    return (ds.batch(batch_size)
+            .map(lambda xb, yb: (tf.cast(xb, tf.float32) * scale + offset, yb),
+                 num_parallel_calls=tf.data.AUTOTUNE)
+            .prefetch(tf.data.AUTOTUNE))
+
+
+def load_train_config(path=TRAIN_CONFIG_PATH):
+    """Tuned training settings, falling back to the training script defaults"""
+    config = dict(DEFAULT_TRAIN_CONFIG)
+    if path.exists():
+        with open(path) as f:
+            config.update(json.load(f))
+    return config
+
+
+def apply_thread_config(config):
+    """Set TensorFlow thread pools (must run before TF builds any op)"""
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(config.get("intra_op_threads", 0))
+    tf.config.threading.set_inter_op_parallelism_threads(config.get("inter_op_threads", 0))
+
+
+def default_model_path(model_name):
+    """Weights file of a newly trained model"""
+    return UNET_PATH if model_name == DEFAULT_MODEL else MODELS_DIR / f"urban_growth_{model_name}.h5"
+
+
+def train_unet(model_name=DEFAULT_MODEL, model_path=None, road_network=False):
+    """Train build_simple_unet on the train/val splits with the tuned config
+    and register it with the split and input bands it was trained on"""
+    from patch_store import PatchStore, patch_store_path
+
+    config = load_train_config()
+    apply_thread_config(config)
+    model_path = model_path or default_model_path(model_name)
+
+    # Partly cloudy patches are down-weighted by their QA valid fraction
+    train_ds = split_dataset("train", config["batch_size"], shuffle=True, weighted=True,
+                             road_network=road_network)
+    val_ds = split_dataset("val", config["batch_size"], road_network=road_network)
+
+    input_shape = tuple(train_ds.element_spec[0].shape[1:])
+    model = build_simple_unet(input_shape)
+    history = model.fit(
+        train_ds,
+        validation_data=val_ds,
+        epochs=config["epochs"]
+    )
+    model.save(model_path)
+    scheme, split_id = current_split_id(config["split_scheme"], road_network)
+    store_path = patch_store_path(road_network)
+    bands = PatchStore(store_path).meta.get("bands") if (store_path / "meta.json").exists() else None
+    register_model(model_name, model_path, architecture="simple_unet",
+                   params=int(model.count_params()), input_shape=list(input_shape),
+                   bands=bands, road_network=road_network,
+                   split_scheme=scheme, split_id=split_id)
+    print(f"✅ Model '{model_name}' saved at: {model_path} (split {scheme}:{split_id})")
+    return model, history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the U-Net on the patch store splits")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Registry name of the trained model")
+    parser.add_argument("--weights", help="Output weights file (default: urban_growth_<model>.h5)")
+    parser.add_argument("--road-network", action="store_true",
+                        help="Train on the 10-band store with the road network bands (splits.py --road-network)")
+    args = parser.parse_args()
+
+    train_unet(args.model, args.weights, args.road_network)
+
+
+if __name__ == "__main__":
+    main()